@@ -0,0 +1,150 @@
+import pandas as pd
+
+from kharch.ledger import Ledger
+from kharch.storage import totals_by_month
+
+CHECK_EVERY_WRITES = 50
+
+
+def _nonzero(totals):
+    return {k: v for k, v in totals.items() if v}
+
+
+def _amounts(rows):
+    return rows['Amount'].fillna(0).astype('int64')
+
+
+class LedgerTotals:
+    # Running balance/spend totals, built once per session and then moved by row deltas only.
+    # Everything is kept in integer paise; the public properties return rupees. Balances come from the
+    # ledger's latest checkpoint (see kharch.ledger), which moves with the same deltas.
+
+    def __init__(self):
+        self.cash_in = 0
+        self.online_in = 0
+        self.cash_out = 0
+        self.online_out = 0
+        self.spent_by_day = {}
+        self.spent_by_month = {}    # YYYY-MM -> {category: paise}
+        # (month, category) pairs moved since the budgets last looked; None after a (re)build
+        self.touched = None
+        self.ledger = Ledger()
+        self.writes = 0
+
+    @classmethod
+    def build(cls, df_expenses, df_funds):
+        totals = cls()
+        totals.add_expenses(df_expenses)
+        totals.add_funds(df_funds)
+        totals.writes = 0
+        totals.touched = None
+        return totals
+
+    @classmethod
+    def from_storage(cls, storage, df_expenses, df_funds):
+        # Same totals as build(), but lets an indexed backend answer them without scanning the frames
+        totals = cls()
+        funds_by_mode = storage.mode_totals("funds", df_funds)
+        totals.cash_in = funds_by_mode.get('Cash', 0)
+        totals.online_in = funds_by_mode.get('Online', 0)
+        totals.cash_out = storage.mode_totals("expenses", df_expenses).get('Cash', 0)
+        totals.online_out = storage.total("expenses", df_expenses) - totals.cash_out
+        daily = storage.daily_totals(df_expenses)
+        totals.spent_by_day = {pd.Timestamp(day): int(amount) for day, amount in zip(daily['Date'], daily['Amount'])}
+        totals._add_by_month(storage.month_totals("expenses", "Category", df_expenses))
+        totals.touched = None
+        totals.ledger = Ledger.from_storage(storage, df_expenses, df_funds)
+        return totals
+
+    @property
+    def bal_cash(self):
+        return self.ledger.balance()["Cash"] / 100
+
+    @property
+    def bal_online(self):
+        return self.ledger.balance()["Online"] / 100
+
+    @property
+    def total_spent(self):
+        return (self.cash_out + self.online_out) / 100
+
+    def spent_on(self, day):
+        return self.spent_by_day.get(pd.Timestamp(day), 0) / 100
+
+    def add_expenses(self, rows, sign=1):
+        if rows.empty:
+            return
+        amounts = _amounts(rows) * sign
+        cash = rows['Mode'] == 'Cash' if 'Mode' in rows.columns else pd.Series(False, index=rows.index)
+        self.cash_out += int(amounts[cash].sum())
+        self.online_out += int(amounts[~cash].sum())
+        for day, amount in amounts.groupby(rows['Date']).sum().items():
+            self.spent_by_day[day] = self.spent_by_day.get(day, 0) + int(amount)
+        self._add_by_month(totals_by_month(rows, "Category"), sign)
+        self.ledger.post_expenses(rows, sign)
+        self.writes += 1
+
+    def _add_by_month(self, totals, sign=1):
+        for month, by_category in totals.items():
+            spent = self.spent_by_month.setdefault(month, {})
+            for category, amount in by_category.items():
+                spent[category] = spent.get(category, 0) + sign * int(amount)
+                if self.touched is not None:
+                    self.touched.add((month, category))
+
+    def spent_in(self, month, category):
+        return self.spent_by_month.get(month, {}).get(category, 0) / 100
+
+    def take_touched(self):
+        # The (month, category) pairs changed since the last call, or None when everything was rebuilt
+        touched, self.touched = self.touched, set()
+        return touched
+
+    def add_funds(self, rows, sign=1):
+        if rows.empty:
+            return
+        amounts = _amounts(rows) * sign
+        self.cash_in += int(amounts[rows['Mode'] == 'Cash'].sum())
+        self.online_in += int(amounts[rows['Mode'] == 'Online'].sum())
+        self.ledger.post_funds(rows, sign)
+        self.writes += 1
+
+    def remove_expenses(self, rows):
+        self.add_expenses(rows, -1)
+
+    def remove_funds(self, rows):
+        self.add_funds(rows, -1)
+
+    def replace_expenses(self, old_rows, new_rows):
+        self.remove_expenses(old_rows)
+        self.add_expenses(new_rows)
+
+    def replace_funds(self, old_rows, new_rows):
+        self.remove_funds(old_rows)
+        self.add_funds(new_rows)
+
+    def matches(self, other):
+        # Integer paise, so totals either agree exactly or have drifted
+        fields = ['cash_in', 'online_in', 'cash_out', 'online_out']
+        if any(getattr(self, f) != getattr(other, f) for f in fields) or not self.ledger.matches(other.ledger):
+            return False
+        days = set(self.spent_by_day) | set(other.spent_by_day)
+        if not all(self.spent_by_day.get(d, 0) == other.spent_by_day.get(d, 0) for d in days):
+            return False
+        months = set(self.spent_by_month) | set(other.spent_by_month)
+        return all(_nonzero(self.spent_by_month.get(m, {})) == _nonzero(other.spent_by_month.get(m, {})) for m in months)
+
+    def verify(self, df_expenses, df_funds, force=False, storage=None):
+        # Rebuild from scratch every CHECK_EVERY_WRITES deltas (or on demand); returns the totals to keep using.
+        # Pass storage when the frames may hold only part of the history.
+        if not force and self.writes < CHECK_EVERY_WRITES:
+            return self
+        if storage is not None:
+            fresh = LedgerTotals.from_storage(storage, df_expenses, df_funds)
+        else:
+            fresh = LedgerTotals.build(df_expenses, df_funds)
+        if not self.matches(fresh):
+            return fresh
+        self.writes = 0
+        return self
+
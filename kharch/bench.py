@@ -0,0 +1,253 @@
+"""Benchmark suite over synthetic ledgers.
+
+    python -m kharch.bench [--sizes 10000 100000 1000000] [--backend csv|sqlite|monthly] [--repeat 5]
+                           [--out bench_results.json] [--compare OLD.json] [--no-app]
+    python -m kharch.bench --cold-start [--sizes 100000] [--pages Calculator Expenses]
+
+For each size a fresh synthetic book (see kharch.synthetic) is written to a temp directory and
+timed: loading, the dashboard totals, the Analysis rollups, add/edit/delete persistence and
+full script reruns through streamlit's AppTest. Cold start runs each page's first render in a
+fresh interpreter, the way a restarted instance serves its first visitor. Results are written as
+JSON so two runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from kharch.aggregates import LedgerTotals
+from kharch.editing import apply_editor_changes
+from kharch.rollups import GRANULARITIES, build_rollups, trend
+from kharch.storage import TABLES, concat_rows, enforce_schema, get_backend, journal_path, with_new_ids
+from kharch.synthetic import write_dataset
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+COLD_START_PAGES = ["Calculator", "Expenses", "Analysis"]
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Kharch_Book_app.py")
+
+
+def timed(fn, repeat):
+    # Median/min wall time of fn() over repeat runs
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {"median": statistics.median(runs), "min": min(runs), "runs": len(runs)}
+
+
+def _new_row(df):
+    row = enforce_schema(pd.DataFrame([{"Date": pd.Timestamp.today().normalize(), "Item": "Bench", "Category": "Food", "Amount": 99.5, "Mode": "Cash"}]))
+    return with_new_ids(row, df)
+
+
+def bytes_on_disk(storage):
+    # Size of the files the backend keeps the book in: every file under a partition directory, the SQLite
+    # database, or the CSV files with their journals. Source CSVs a backend migrated from are not counted.
+    if storage.single_file:
+        paths = [storage.db_path]
+    else:
+        paths = [p for table in TABLES for p in (storage.path(table), journal_path(storage.path(table)))]
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def bench_storage(storage, repeat):
+    results = {}
+    results["load"] = {table: timed(lambda table=table: storage.load(table), repeat) for table in TABLES}
+    dfe, dff = storage.load("expenses"), storage.load("funds")
+
+    results["totals_build"] = timed(lambda: LedgerTotals.build(dfe, dff), repeat)
+    results["totals_from_storage"] = timed(lambda: LedgerTotals.from_storage(storage, dfe, dff), repeat)
+    results["rollups"] = timed(lambda: build_rollups(storage, dfe), repeat)
+    rollups = build_rollups(storage, dfe)
+    results["trend"] = {g: timed(lambda g=g: trend(rollups, g), repeat) for g in GRANULARITIES}
+
+    # Persistence runs against the shared frame, the way the app writes
+    def add():
+        df, version = storage.shared("expenses")
+        new_rows = _new_row(df)
+        storage.append("expenses", new_rows, concat_rows(new_rows, df), version)
+
+    def edit():
+        df, version = storage.shared("expenses")
+        row_id = int(df.index[0])
+        df, _, _ = apply_editor_changes(df, {"edited_rows": {0: {"Item": "Bench (edited)"}}}, TABLES["expenses"][1], [row_id])
+        storage.apply_changes("expenses", df, [row_id], [], version)
+
+    def delete():
+        df, version = storage.shared("expenses")
+        row_id = int(df.index[0])
+        storage.apply_changes("expenses", df.drop(index=row_id), [], [row_id], version)
+
+    # The in-memory half of an editor change on its own, without the write
+    def edit_frame():
+        df, _ = storage.shared("expenses")
+        apply_editor_changes(df, {"edited_rows": {0: {"Item": "Bench (edited)"}}}, TABLES["expenses"][1], [int(df.index[0])])
+
+    def delete_frame():
+        df, _ = storage.shared("expenses")
+        apply_editor_changes(df, {"deleted_rows": [0]}, TABLES["expenses"][1], [int(df.index[0])])
+
+    results["edit_frame"] = timed(edit_frame, repeat)
+    results["delete_frame"] = timed(delete_frame, repeat)
+    results["add"] = timed(add, repeat)
+    results["edit"] = timed(edit, repeat)
+    results["delete"] = timed(delete, repeat)
+    return results
+
+
+def bench_app(data_dir, backend_name, repeat):
+    # Full script runs: the first pays for loading and the totals, later ones are plain reruns
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    cwd, env = os.getcwd(), os.environ.get("KHARCH_BACKEND")
+    os.chdir(data_dir)
+    os.environ["KHARCH_BACKEND"] = backend_name
+    try:
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        app = AppTest.from_file(APP_FILE, default_timeout=600)
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        results = {"first_run": first, "rerun": timed(app.run, repeat)}
+        for page in ["Analysis", "Calculator"]:
+            app.sidebar.radio[0].set_value(page)
+            results[f"rerun_{page.lower()}"] = timed(app.run, repeat)
+        return results
+    finally:
+        os.chdir(cwd)
+        if env is None:
+            os.environ.pop("KHARCH_BACKEND", None)
+        else:
+            os.environ["KHARCH_BACKEND"] = env
+
+
+# Runs in a fresh interpreter; prints the timings as JSON on its last line
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=600)
+app.session_state["page"] = sys.argv[2]
+app.run()
+done = time.perf_counter()
+print(json.dumps({"import_streamlit": imported - start, "first_render": done - imported,
+                  "altair_loaded": "altair" in sys.modules, "error": app.exception[0].value if app.exception else None}))
+"""
+
+
+def bench_cold_start(data_dir, backend_name, pages, repeat):
+    # Time to first render per page: interpreter start, imports and the first script run
+    env = dict(os.environ, KHARCH_BACKEND=backend_name, PYTHONPATH=os.path.dirname(APP_FILE))
+    results = {}
+    for page in pages:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = subprocess.run([sys.executable, "-c", COLD_START_SCRIPT, APP_FILE, page], cwd=data_dir, env=env,
+                                 capture_output=True, text=True, check=True)
+            report = json.loads(out.stdout.strip().splitlines()[-1])
+            report["process"] = time.perf_counter() - start
+            if report["error"]:
+                raise RuntimeError(report["error"])
+            runs.append(report)
+        results[page] = {
+            key: {"median": statistics.median(r[key] for r in runs), "min": min(r[key] for r in runs), "runs": len(runs)}
+            for key in ["process", "import_streamlit", "first_render"]
+        }
+        results[page]["altair_loaded"] = runs[-1]["altair_loaded"]
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_FILE), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, backend_name="csv", repeat=5, app=True, seed=0, cold_start_pages=None):
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "backend": backend_name,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "sizes": {},
+    }
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="kharch-bench-") as data_dir:
+            start = time.perf_counter()
+            write_dataset(data_dir, size, seed=seed)
+            storage = get_backend(backend_name, data_dir)
+            results = {"setup": time.perf_counter() - start, "bytes_on_disk": bytes_on_disk(storage)}
+            results.update(bench_storage(storage, repeat))
+            if app:
+                results["app"] = bench_app(data_dir, backend_name, repeat)
+            if cold_start_pages:
+                results["cold_start"] = bench_cold_start(data_dir, backend_name, cold_start_pages, repeat)
+        report["sizes"][str(size)] = results
+        print(f"{size:>9} rows: load {results['load']['expenses']['median']:.3f}s, "
+              f"totals {results['totals_build']['median']:.3f}s, add {results['add']['median']:.3f}s"
+              + (f", rerun {results['app']['rerun']['median']:.3f}s" if app else ""), file=sys.stderr)
+    return report
+
+
+def _medians(node, prefix=""):
+    # Flatten a report into {"100000.load.expenses": median seconds}
+    if isinstance(node, dict) and "median" in node:
+        return {prefix: node["median"]}
+    if isinstance(node, dict):
+        flat = {}
+        for key, value in node.items():
+            flat.update(_medians(value, f"{prefix}.{key}" if prefix else key))
+        return flat
+    return {prefix: node} if isinstance(node, float) else {}
+
+
+def compare(old, new):
+    old_times, new_times = _medians(old["sizes"]), _medians(new["sizes"])
+    for key in sorted(set(old_times) & set(new_times)):
+        if old_times[key]:
+            print(f"{key:<45} {old_times[key]:>9.4f}s -> {new_times[key]:>9.4f}s  x{new_times[key] / old_times[key]:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--backend", default="csv")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--no-app", action="store_true", help="skip the AppTest reruns")
+    parser.add_argument("--cold-start", action="store_true", help="also time first renders in fresh interpreters")
+    parser.add_argument("--pages", nargs="+", default=COLD_START_PAGES, help="pages for --cold-start")
+    args = parser.parse_args()
+    report = run(args.sizes, args.backend, args.repeat, not args.no_app, args.seed, args.pages if args.cold_start else None)
+    with open(args.out, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Wrote {args.out}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), report)
@@ -0,0 +1,91 @@
+"""Monthly spending budgets per category, with alerts at configured thresholds.
+
+Budgets live in budgets.json in the data directory, next to expenses.csv:
+
+    {"limits": {"Food": 800000, ...}, "thresholds": [0.8, 1.0], "alerted": {"2026-10": {"Food": 0.8}}}
+
+Limits are paise per month. alerted records the highest threshold each (month, category) has
+already been warned about, so every session reports a crossing once. Spending comes from the
+per-(month, category) totals LedgerTotals keeps up to date, and only the pairs a change touched
+are checked again.
+"""
+import os
+from collections import namedtuple
+
+from kharch.storage import JsonFile
+
+BUDGETS_FILE = 'budgets.json'
+DEFAULT_THRESHOLDS = [0.8, 1.0]
+THRESHOLD_CHOICES = [0.5, 0.75, 0.8, 0.9, 1.0, 1.25]
+
+Alert = namedtuple("Alert", ["month", "category", "spent", "limit", "threshold"])
+
+
+class Budgets:
+
+    def __init__(self, limits=None, thresholds=None, alerted=None):
+        self.limits = dict(limits or {})
+        self.thresholds = sorted(thresholds or DEFAULT_THRESHOLDS)
+        self.alerted = {month: dict(levels) for month, levels in (alerted or {}).items()}
+
+    def to_json(self):
+        return {"limits": self.limits, "thresholds": self.thresholds, "alerted": self.alerted}
+
+    def level(self, spent, category):
+        # Highest threshold spent (paise) has reached for category, or None
+        limit = self.limits.get(category)
+        if not limit:
+            return None
+        reached = [t for t in self.thresholds if spent >= t * limit]
+        return reached[-1] if reached else None
+
+    def check(self, spent_by_month, pairs):
+        # New threshold crossings among pairs of (month, category); records them in self.alerted.
+        # A pair that dropped back below its recorded threshold is lowered so it can be reported again.
+        alerts = []
+        for month, category in sorted(pairs):
+            if category not in self.limits:
+                continue
+            spent = spent_by_month.get(month, {}).get(category, 0)
+            level = self.level(spent, category)
+            seen = self.alerted.get(month, {}).get(category)
+            if level == seen:
+                continue
+            if level is None:
+                self.alerted[month].pop(category)
+            else:
+                self.alerted.setdefault(month, {})[category] = level
+            if seen is None or (level is not None and level > seen):
+                alerts.append(Alert(month, category, spent, self.limits[category], level))
+        return alerts
+
+    def status(self, spent_by_month, month):
+        # (category, spent, limit, level) for every budgeted category in month, most used first
+        spent = spent_by_month.get(month, {})
+        rows = [(category, spent.get(category, 0), limit, self.level(spent.get(category, 0), category))
+                for category, limit in self.limits.items() if limit > 0]
+        return sorted(rows, key=lambda r: r[1] / r[2], reverse=True)
+
+
+class BudgetStore:
+    # budgets.json of one data directory
+
+    def __init__(self, data_dir="."):
+        self.file = JsonFile(os.path.join(data_dir, BUDGETS_FILE), {})
+        self.path = self.file.path
+
+    def load(self):
+        return Budgets(**self.file.load())
+
+    def save(self, budgets):
+        with self.file.lock():
+            self.file.save(budgets.to_json())
+
+    def record_alerts(self, spent_by_month, pairs):
+        # Checks pairs against the file's budgets under its lock, so two sessions never report the same crossing
+        with self.file.lock():
+            budgets = self.load()
+            alerts = budgets.check(spent_by_month, pairs)
+            if alerts or budgets.alerted != self.load().alerted:
+                self.file.save(budgets.to_json())
+        return alerts
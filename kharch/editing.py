@@ -0,0 +1,221 @@
+import atexit
+import collections
+import threading
+import time
+import weakref
+
+import pandas as pd
+
+from kharch import profiling
+from kharch.storage import ConflictError, concat_rows, with_new_ids
+
+EDIT_FLUSH_SECONDS = 2.0
+EDIT_FLUSH_ROWS = 200
+# Profiles of background flushes kept for the debug panel
+FLUSH_PROFILES_KEPT = 5
+
+
+def _set_cell(df, row_id, col, value):
+    # Editor values arrive as JSON (ISO dates, rupee floats); store them in the frame's schema
+    if value is None:
+        value = pd.NA if col == "Amount" else None
+    elif col == "Date":
+        value = pd.Timestamp(value)
+    elif col == "Amount":
+        value = round(float(value) * 100)
+    elif col == "Done":
+        value = bool(value)
+    elif isinstance(df[col].dtype, pd.CategoricalDtype) and value not in df[col].cat.categories:
+        df[col] = df[col].cat.add_categories([value])
+    df.loc[row_id, col] = value
+
+
+def apply_editor_changes(df, changes, columns, ids=None):
+    # Applies st.data_editor's edited_rows/added_rows/deleted_rows to df. Positions refer to ids,
+    # the row ids of the (possibly filtered or paged) frame the editor showed, defaulting to all of df.
+    # Returns the new frame plus the touched rows before and after, indexed by row id.
+    # Cell edits copy only the edited columns. Deleting or adding rows still builds a new frame, O(n) in the
+    # table, and the CSV backend then rewrites the file (CSVBackend._apply_changes); kharch.bench times
+    # the frame alone (edit_frame, delete_frame) and with the write (edit, delete).
+    if ids is None:
+        ids = df.index
+    edited = {ids[int(pos)]: row for pos, row in changes.get("edited_rows", {}).items()}
+    deleted = [ids[int(pos)] for pos in changes.get("deleted_rows", [])]
+    added = changes.get("added_rows", [])
+
+    old_rows = df.loc[list(edited) + deleted].copy()
+    if edited:
+        # df may be the process-wide shared frame, so never edit it in place; untouched columns stay shared
+        df = df.copy(deep=False)
+        for col in {col for row in edited.values() for col in row}:
+            df[col] = df[col].copy()
+    for row_id, row in edited.items():
+        for col, value in row.items():
+            _set_cell(df, row_id, col, value)
+    new_rows = df.loc[list(edited)]
+
+    if deleted:
+        df = df.drop(deleted)
+    if added:
+        rows = pd.DataFrame([{col: r.get(col) for col in columns} for r in added], columns=columns)
+        if "Done" in rows.columns:
+            rows["Done"] = rows["Done"].fillna(False).astype(bool)
+        rows = with_new_ids(rows, df)
+        df = concat_rows(rows, df)
+        new_rows = concat_rows(df.loc[rows.index], new_rows)
+    return df, old_rows, new_rows
+
+
+class PendingWrites:
+    # Write-behind queue for one session. Changes are applied to the session's frames straight away and
+    # written by a background thread; several quick changes to a table go out as one write. Frames are
+    # never modified in place, so the queue keeps a reference to the latest one instead of copying it.
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.tables = {}        # table -> queued change: latest frame, base version, new/upserted/deleted ids
+        self.in_flight = set()
+        self.versions = {}      # table -> version our last write of it produced
+        self.since = None
+        self.conflicts = []
+        self.error = None
+        self.saved_at = None
+        # Set by the app while timings are on: each background flush is then profiled as a run of its own
+        self.profile = False
+        self.profiles = collections.deque(maxlen=FLUSH_PROFILES_KEPT)
+        self._lock = threading.Condition()
+        self._writing = threading.Lock()
+        self._thread = None
+        _queues.add(self)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(c["new"]) + len(c["upserts"]) + len(c["deletes"]) for c in self.tables.values())
+
+    def busy(self):
+        # Something queued or being written
+        with self._lock:
+            return bool(self.tables or self.in_flight)
+
+    def has(self, table):
+        # True while a change to table is queued or being written; the session must not reload it meanwhile
+        with self._lock:
+            return table in self.tables or table in self.in_flight
+
+    def add(self, table, frame, base_version, upsert_ids=(), delete_ids=(), new_ids=()):
+        # frame is the table with the change applied; base_version is the version it was loaded at
+        with self._lock:
+            change = self.tables.setdefault(table, {"base": base_version, "new": [], "upserts": set(), "deletes": set()})
+            change["frame"] = frame
+            change["new"] = list(new_ids) + change["new"]
+            change["upserts"].update(upsert_ids)
+            change["upserts"].difference_update(delete_ids)
+            change["deletes"].update(delete_ids)
+            if self.since is None:
+                self.since = time.monotonic()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kharch-write-behind", daemon=True)
+                self._thread.start()
+            self._lock.notify_all()
+
+    def due(self):
+        if self.since is None:
+            return False
+        return time.monotonic() - self.since >= EDIT_FLUSH_SECONDS or len(self) >= EDIT_FLUSH_ROWS
+
+    def _run(self):
+        # Lives while there is something queued, so an idle session holds no thread
+        with self._lock:
+            while self.tables:
+                if not self.due():
+                    self._lock.wait(max(0.05, (self.since or time.monotonic()) + EDIT_FLUSH_SECONDS - time.monotonic()))
+                    continue
+                self._lock.release()
+                try:
+                    self._background_flush()
+                finally:
+                    self._lock.acquire()
+            self._thread = None
+
+    def _background_flush(self):
+        # No rerun is there to count this thread's writes, so a profiled flush is a run (and log line) of its own
+        if not self.profile:
+            self.flush(force=True)
+            return
+        profiling.start_run("write-behind")
+        wrote = False
+        try:
+            wrote = self.flush(force=True)
+        finally:
+            record = profiling.finish_run(log=profiling.log_path() if wrote else None)
+            if wrote:
+                self.profiles.append(record)
+
+    def flush(self, force=False):
+        # Writes everything queued, in the calling thread, once due (or now with force); returns whether it wrote.
+        # A table that changed underneath us is dropped and reported in self.conflicts for a reload; any other
+        # failure keeps the change queued and is retried after EDIT_FLUSH_SECONDS.
+        with self._writing:
+            with self._lock:
+                if not self.tables or not (force or self.due()):
+                    return False
+                batch, self.tables, self.since = self.tables, {}, None
+                self.in_flight.update(batch)
+            failed, error = {}, None
+            for table, change in batch.items():
+                try:
+                    self._write(table, change)
+                except ConflictError:
+                    self.storage.invalidate(table)
+                    self.conflicts.append(table)
+                except Exception as e:
+                    failed[table], error = change, e
+            with self._lock:
+                self.in_flight.difference_update(batch)
+                for table, change in failed.items():
+                    self._requeue(table, change)
+                if failed:
+                    self.error = f"{type(error).__name__}: {error}"
+                    self.since = time.monotonic()
+                else:
+                    self.error = None
+                    self.saved_at = time.time()
+            return True
+
+    def _write(self, table, change):
+        # Versions only grow, so the newer of the session's base and our own last write is the one the frame
+        # was derived from
+        known = [v for v in (change["base"], self.versions.get(table)) if v is not None]
+        base = max(known, default=None)
+        frame = change["frame"]
+        new_ids = [i for i in change["new"] if i in frame.index]
+        if change["upserts"] or change["deletes"]:
+            try:
+                self.versions[table] = self.storage.apply_changes(table, frame, change["upserts"] | set(new_ids), change["deletes"], base)
+            except ConflictError:
+                if new_ids:
+                    # Added rows commute with whatever was written meanwhile; only the edits are lost
+                    self.storage.append(table, frame.loc[new_ids], None, base)
+                raise
+        elif new_ids:
+            self.versions[table] = self.storage.append(table, frame.loc[new_ids], frame, base)
+
+    def _requeue(self, table, change):
+        newer = self.tables.get(table)
+        if newer is None:
+            self.tables[table] = change
+            return
+        # Anything queued meanwhile was made on top of the failed change's frame
+        newer["base"] = change["base"]
+        newer["new"] = newer["new"] + change["new"]
+        newer["upserts"] |= change["upserts"] - newer["deletes"]
+        newer["deletes"] |= change["deletes"]
+
+
+_queues = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_at_exit():
+    for queue in list(_queues):
+        queue.flush(force=True)
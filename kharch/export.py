@@ -0,0 +1,172 @@
+"""Backup exports of the book: expenses, funds and todo as CSV, gzip-CSV or Parquet.
+
+    python -m kharch.export backup.zip [--data-dir .] [--backend csv|sqlite|monthly]
+        [--format csv|csv.gz|parquet] [--tables expenses funds] [--from 2024-04-01] [--to 2025-03-31]
+
+Exports are serialized CHUNK_ROWS rows at a time and handed out as byte chunks. Only the CLI
+streams them: it writes each chunk to the file, so a large book is never held as one string.
+The app's download button needs the whole export as bytes (export_bytes). One table is exported
+as a single file, several go into a zip with one member per table. CSV exports use the same layout as the book's own files, so a
+backup can be restored by copying it into a data directory.
+"""
+import argparse
+import importlib.util
+import io
+import zipfile
+import zlib
+from datetime import date
+
+import pandas as pd
+
+from kharch.storage import ALL_HISTORY, TABLES, get_backend, to_disk, to_rupees, with_id_column
+
+CHUNK_ROWS = 50_000
+
+# format -> (file extension, MIME type)
+FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats():
+    # Parquet needs pyarrow, which is optional; it is only imported once a Parquet export is built
+    return [fmt for fmt in FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow")]
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file that hands out what was written since the last take(); tell() keeps counting, which
+    # is all the zip and Parquet writers need from a non-seekable stream
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def in_range(df, start=None, end=None):
+    # Rows dated within [start, end]; tables without a Date column are exported whole
+    if 'Date' not in df.columns or (start is None and end is None):
+        return df
+    mask = df['Date'].notna()
+    if start is not None:
+        mask &= df['Date'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['Date'] <= pd.Timestamp(end)
+    return df[mask]
+
+
+def csv_chunks(df):
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        chunk = with_id_column(to_disk(df.iloc[start:start + CHUNK_ROWS]))
+        yield chunk.to_csv(header=start == 0, index=False, date_format='%Y-%m-%d').encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 16 + MAX_WBITS: a gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def parquet_chunks(df):
+    # One row group per chunk. Amounts are written as rupees like the CSVs, dates and categories keep their types.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema, writer = None, None
+    for start in range(0, max(len(df), 1), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS]
+        if 'Amount' in chunk.columns:
+            chunk = chunk.assign(Amount=to_rupees(chunk['Amount']))
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        if writer is None:
+            schema = table.schema
+            writer = pq.ParquetWriter(sink, schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def table_chunks(df, fmt):
+    if fmt == "csv":
+        return csv_chunks(df)
+    if fmt == "csv.gz":
+        return gzip_chunks(csv_chunks(df))
+    if fmt == "parquet":
+        return parquet_chunks(df)
+    raise ValueError(f"unknown export format {fmt!r}")
+
+
+def file_name(tables, fmt, stamp=None):
+    if len(tables) == 1:
+        return f"{tables[0]}.{FORMATS[fmt][0]}"
+    return f"kharch_backup_{stamp or date.today():%Y-%m-%d}.zip"
+
+
+def mime_type(tables, fmt):
+    return FORMATS[fmt][1] if len(tables) == 1 else "application/zip"
+
+
+def export_chunks(frames, fmt, start=None, end=None):
+    # frames: table -> frame, in the order they should appear. Yields the export as byte chunks.
+    frames = {table: in_range(df, start, end) for table, df in frames.items()}
+    if len(frames) == 1:
+        yield from table_chunks(next(iter(frames.values())), fmt)
+        return
+    sink = _ChunkSink()
+    # gzip and Parquet members are compressed already; deflating them again only costs time
+    compression = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+    with zipfile.ZipFile(sink, "w", compression) as archive:
+        for table, df in frames.items():
+            with archive.open(f"{table}.{FORMATS[fmt][0]}", "w") as member:
+                for chunk in table_chunks(df, fmt):
+                    member.write(chunk)
+                    yield sink.take()
+    yield sink.take()
+
+
+def export_bytes(frames, fmt, start=None, end=None):
+    return b"".join(export_chunks(frames, fmt, start, end))
+
+
+def load_frames(storage, tables):
+    # Whole tables as the storage shares them: table -> (df, version)
+    return {table: storage.shared(table, ALL_HISTORY) for table in tables}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES))
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    storage = get_backend(args.backend, args.data_dir)
+    frames = {table: df for table, (df, _) in load_frames(storage, args.tables).items()}
+    written = 0
+    with open(args.out, "wb") as fh:
+        for chunk in export_chunks(frames, args.format, args.start, args.end):
+            written += fh.write(chunk)
+    print(f"Wrote {written:,} bytes to {args.out}")
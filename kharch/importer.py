@@ -0,0 +1,155 @@
+"""Bulk import of bank/UPI statement CSVs into expenses.
+
+    python -m kharch.importer statement.csv [--data-dir .] [--backend csv|sqlite|monthly]
+        [--map Date=Txn Date --map Item=Narration --map Amount=Withdrawal Amt]
+        [--category Other] [--mode Online] [--signed]
+
+The statement is read in chunks, parsed column-wise and checked against a counted hash index
+over (Date, Amount, Item) of the book, so re-importing an overlapping statement only adds the
+new transactions while genuine repeats (two identical chai payments on one day) are kept. All
+new rows go out in one write.
+"""
+import argparse
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from kharch.storage import ALL_HISTORY, EXPENSE_COLUMNS, concat_rows, empty_frame, enforce_schema, get_backend, with_new_ids
+
+CHUNK_ROWS = 50_000
+
+COLUMN_ALIASES = {
+    "Date": ["date", "txn date", "transaction date", "tran date", "value date", "posting date"],
+    "Item": ["item", "description", "narration", "particulars", "remarks", "details", "transaction details"],
+    "Amount": ["amount", "debit", "withdrawal", "withdrawal amt", "withdrawal amt.", "withdrawal amount",
+               "debit amount", "dr amount", "amount (inr)"],
+    "Category": ["category"],
+    "Mode": ["mode"],
+}
+
+ImportResult = namedtuple("ImportResult", ["added", "duplicates", "skipped", "rows", "version"])
+
+
+def detect_mapping(columns):
+    # Best guess of statement column for each ledger column; missing ones are left out
+    lookup = {str(c).strip().lower(): c for c in columns}
+    mapping = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lookup:
+                mapping[target] = lookup[alias]
+                break
+    return mapping
+
+
+def row_keys(dates, amounts, items):
+    # uint64 hash of (day, paise, item) per row of schema-typed columns, computed column-wise
+    keys = pd.DataFrame({
+        "Date": dates.values.astype('datetime64[D]').astype('int64'),
+        "Amount": amounts.fillna(0).astype('int64').values,
+        "Item": pd.Series(items).fillna("").astype(str).str.strip().values,
+    })
+    return pd.util.hash_pandas_object(keys, index=False).values
+
+
+class DedupeIndex:
+    # How many rows of the book share each key
+    def __init__(self, keys=()):
+        self.counts = Counter(np.asarray(keys, dtype='uint64').tolist())
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty:
+            return cls()
+        return cls(row_keys(df['Date'], df['Amount'], df['Item']))
+
+    def take_new(self, keys):
+        # Mask of keys the book holds no unmatched copy of. Each duplicate uses up one copy, so a row that
+        # appears n times in a statement is skipped only as often as the book already has it. A hash map
+        # keeps this O(1) per key however large the book is.
+        counts = self.counts
+
+        def is_new(key):
+            if counts.get(key):
+                counts[key] -= 1
+                return False
+            return True
+
+        return np.fromiter(map(is_new, keys.tolist()), dtype=bool, count=len(keys))
+
+
+def parse_chunk(chunk, mapping, default_category, default_mode, dayfirst=True, signed=False):
+    # Returns (ledger rows, number of rows that were not spends or could not be parsed)
+    amounts = chunk[mapping["Amount"]]
+    if not pd.api.types.is_numeric_dtype(amounts):
+        amounts = amounts.astype(str).str.replace(r'[₹,\s]', '', regex=True)
+    amounts = pd.to_numeric(amounts, errors='coerce')
+    if signed:
+        # Signed statements show spends as negative amounts
+        amounts = -amounts
+    dates = pd.to_datetime(chunk[mapping["Date"]], dayfirst=dayfirst, errors='coerce', format='mixed')
+    rows = pd.DataFrame({
+        "Date": dates,
+        "Item": chunk[mapping["Item"]].fillna("").astype(str).str.strip() if "Item" in mapping else "Imported",
+        "Category": chunk[mapping["Category"]].fillna(default_category) if "Category" in mapping else default_category,
+        "Amount": amounts,
+        "Mode": chunk[mapping["Mode"]].fillna(default_mode) if "Mode" in mapping else default_mode,
+    }, columns=EXPENSE_COLUMNS)
+    valid = rows["Date"].notna() & (rows["Amount"] > 0)
+    return enforce_schema(rows[valid]), int((~valid).sum())
+
+
+def import_statement(source, storage, mapping=None, default_category="Other", default_mode="Online",
+                     dayfirst=True, signed=False, chunksize=CHUNK_ROWS, base_version=None):
+    if mapping is None:
+        mapping = detect_mapping(pd.read_csv(source, nrows=0).columns)
+        if hasattr(source, "seek"):
+            source.seek(0)
+    missing = {"Date", "Amount"} - set(mapping)
+    if missing:
+        raise ValueError(f"No statement column mapped to {', '.join(sorted(missing))}")
+
+    # Duplicates can be from any month, so this needs the whole history even from a partitioned backend
+    df, version = storage.shared("expenses", ALL_HISTORY)
+    index = DedupeIndex.from_frame(df)
+    parts, duplicates, skipped = [], 0, 0
+    for chunk in pd.read_csv(source, chunksize=chunksize, usecols=list(set(mapping.values()))):
+        rows, bad = parse_chunk(chunk, mapping, default_category, default_mode, dayfirst, signed)
+        skipped += bad
+        fresh = index.take_new(row_keys(rows["Date"], rows["Amount"], rows["Item"]))
+        duplicates += int((~fresh).sum())
+        parts.append(rows[fresh])
+
+    new_rows = enforce_schema(pd.concat(parts, ignore_index=True)) if parts else empty_frame(EXPENSE_COLUMNS)
+    if new_rows.empty:
+        return ImportResult(0, duplicates, skipped, new_rows, version)
+    # Newest first, like rows added through the Add Expense form
+    new_rows = with_new_ids(new_rows.sort_values("Date", ascending=False, kind="stable"), df)
+    combined = concat_rows(new_rows, df)
+    version = storage.append("expenses", new_rows, combined, base_version if base_version is not None else version)
+    return ImportResult(len(new_rows), duplicates, skipped, new_rows, version)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a bank/UPI statement CSV into expenses")
+    parser.add_argument("statement")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--backend", default=None, help="csv, sqlite or monthly (default: $KHARCH_BACKEND or csv)")
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help="statement column for Date, Item, Category, Amount or Mode")
+    parser.add_argument("--category", default="Other", help="category for rows without one")
+    parser.add_argument("--mode", default="Online", choices=["Online", "Cash"])
+    parser.add_argument("--monthfirst", action="store_true", help="dates are MM/DD rather than DD/MM")
+    parser.add_argument("--signed", action="store_true", help="spends are negative amounts")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    mapping = detect_mapping(pd.read_csv(args.statement, nrows=0).columns)
+    mapping.update(dict(m.split("=", 1) for m in args.map))
+    start = time.perf_counter()
+    result = import_statement(args.statement, get_backend(args.backend, args.data_dir), mapping, args.category,
+                              args.mode, not args.monthfirst, args.signed, args.chunksize)
+    print(f"Imported {result.added} rows, skipped {result.duplicates} duplicates and {result.skipped} "
+          f"non-spend/unparseable rows in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,103 @@
+"""The Cash and Online accounts as a ledger with month-end balance checkpoints.
+
+Every funds row posts into its account and every expense posts out of one; a transfer is a pair
+of funds rows whose postings cancel across the two accounts. Postings are kept netted per month
+and a checkpoint is the running balance at the end of a month, so
+
+- the current balance is the latest checkpoint,
+- the balance on any day is the previous month's checkpoint plus that one month's rows up to the day,
+- the balance history is one point per month however many years the book covers.
+
+Undated rows sort first and count as the opening balance. Everything is integer paise.
+"""
+import pandas as pd
+
+from kharch.storage import UNDATED, totals_by_month
+
+ACCOUNTS = ["Cash", "Online"]
+# Expenses that are not Cash come out of Online, the same split as LedgerTotals' cash_out/online_out
+EXPENSE_DEFAULT_ACCOUNT = "Online"
+
+
+class Ledger:
+
+    def __init__(self):
+        self.months = {}        # YYYY-MM -> {account: paise posted that month}
+        self._checkpoints = None
+
+    @classmethod
+    def build(cls, df_expenses, df_funds):
+        ledger = cls()
+        ledger.post_expenses(df_expenses)
+        ledger.post_funds(df_funds)
+        return ledger
+
+    @classmethod
+    def from_storage(cls, storage, df_expenses, df_funds):
+        # Same ledger as build(), from the storage's per-month totals (the monthly backend never reads old rows)
+        ledger = cls()
+        ledger._post(storage.month_totals("funds", "Mode", df_funds), 1)
+        ledger._post(storage.month_totals("expenses", "Mode", df_expenses), -1, EXPENSE_DEFAULT_ACCOUNT)
+        return ledger
+
+    def _post(self, totals, sign, default=None):
+        for month, by_mode in totals.items():
+            net = self.months.setdefault(month, dict.fromkeys(ACCOUNTS, 0))
+            for mode, amount in by_mode.items():
+                account = mode if mode in net else default
+                if account is not None:
+                    net[account] += sign * int(amount)
+        self._checkpoints = None
+
+    def post_funds(self, rows, sign=1):
+        self._post(totals_by_month(rows, "Mode"), sign)
+
+    def post_expenses(self, rows, sign=1):
+        self._post(totals_by_month(rows, "Mode"), -sign, EXPENSE_DEFAULT_ACCOUNT)
+
+    @property
+    def checkpoints(self):
+        # Running balance per account at the end of each month, oldest first
+        if self._checkpoints is None:
+            months = sorted(self.months)
+            net = pd.DataFrame([self.months[m] for m in months], index=pd.Index(months, name="Month"), columns=ACCOUNTS)
+            self._checkpoints = net.astype('int64').cumsum()
+        return self._checkpoints
+
+    def balance(self):
+        checkpoints = self.checkpoints
+        if checkpoints.empty:
+            return dict.fromkeys(ACCOUNTS, 0)
+        return {account: int(v) for account, v in checkpoints.iloc[-1].items()}
+
+    def balance_on(self, day, month_rows):
+        # Balances at the end of day. month_rows(table, month) returns a table's rows for one month;
+        # only the month of day is asked for.
+        day = pd.Timestamp(day).normalize()
+        month = day.strftime('%Y-%m')
+        checkpoints = self.checkpoints
+        before = checkpoints[checkpoints.index < month]
+        balance = {account: int(v) for account, v in before.iloc[-1].items()} if len(before) else dict.fromkeys(ACCOUNTS, 0)
+        scan = Ledger()
+        scan.post_funds(_through(month_rows("funds", month), day))
+        scan.post_expenses(_through(month_rows("expenses", month), day))
+        for account, amount in scan.balance().items():
+            balance[account] += amount
+        return balance
+
+    def history(self):
+        # Month-end balances as a long frame (Date, Account, Balance in rupees) for charting
+        checkpoints = self.checkpoints.drop(index=UNDATED, errors='ignore')
+        if checkpoints.empty:
+            return pd.DataFrame(columns=["Date", "Account", "Balance"])
+        dates = pd.to_datetime(checkpoints.index) + pd.offsets.MonthEnd(0)
+        wide = (checkpoints / 100).set_axis(dates).rename_axis("Date")
+        return wide.reset_index().melt(id_vars="Date", var_name="Account", value_name="Balance")
+
+    def matches(self, other):
+        zero = dict.fromkeys(ACCOUNTS, 0)
+        return all(self.months.get(m, zero) == other.months.get(m, zero) for m in set(self.months) | set(other.months))
+
+
+def _through(rows, day):
+    return rows[rows['Date'] <= day]
@@ -0,0 +1,19 @@
+import importlib
+
+# Menu label -> module in this package. A page module, and whatever heavy libraries it needs,
+# is only imported the first time that page is opened.
+PAGES = {
+    "Expenses": "expenses",
+    "Wallet": "wallet",
+    "Calculator": "calculator",
+    "Analysis": "analysis",
+    "To-Buy List": "todo",
+    "Funds History": "funds",
+    "Recurring": "recurring",
+    "Search": "search",
+    "Import": "statement",
+}
+
+
+def render(label):
+    importlib.import_module(f"{__name__}.{PAGES[label]}").render()
@@ -0,0 +1,54 @@
+"""Analysis: category and trend charts. The only page that needs altair."""
+import altair as alt
+import streamlit as st
+
+from kharch.rollups import AXIS_FORMATS, GRANULARITIES, MAX_TREND_POINTS, build_rollups, trend
+from kharch.session import get_storage, load_table
+
+
+@st.cache_data(max_entries=16)
+def cached_rollups(version, _storage, _df):
+    return build_rollups(_storage, _df)
+
+
+def render():
+    # The rollups are queried from storage, which only holds saved rows
+    if st.session_state.pending.has("expenses"):
+        st.session_state.pending.flush(force=True)
+    df_expenses = load_table("expenses")
+    rollups = cached_rollups(st.session_state.data_versions["expenses"], get_storage(), df_expenses)
+
+    st.title("📊 Analysis")
+    if len(rollups["daily"]) or len(rollups["category"]):
+        col_charts1, col_charts2 = st.columns(2)
+        
+        with col_charts1:
+            st.markdown("##### 🍩 Expenses by Category")
+            category_data = rollups["category"]
+            base = alt.Chart(category_data).encode(theta=alt.Theta("Amount", stack=True))
+            pie = base.mark_arc(outerRadius=120, innerRadius=80).encode(
+                color=alt.Color("Category"),
+                order=alt.Order("Amount", sort="descending"),
+                tooltip=["Category", "Amount"]
+            )
+            text = base.mark_text(radius=140).encode(
+                text="Amount",
+                order=alt.Order("Amount", sort="descending"),
+                color=alt.value("white")
+            )
+            st.altair_chart(pie + text, use_container_width=True)
+
+        with col_charts2:
+            st.markdown("##### 📅 Spending Trend")
+            granularity = st.radio("Granularity", GRANULARITIES, horizontal=True, label_visibility="collapsed")
+            granularity, trend_data = trend(rollups, granularity)
+            bar_chart = alt.Chart(trend_data).mark_bar(color='#FF5252').encode(
+                x=alt.X('Date:T', axis=alt.Axis(format=AXIS_FORMATS[granularity]), title=granularity),
+                y='Amount',
+                tooltip=['Date', 'Amount']
+            ).interactive()
+            st.altair_chart(bar_chart, use_container_width=True)
+            if len(trend_data) == MAX_TREND_POINTS:
+                st.caption(f"Latest {MAX_TREND_POINTS} {granularity.lower()}s")
+    else:
+        st.info("Add some expenses to see your analytics here.")
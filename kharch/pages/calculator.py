@@ -0,0 +1,57 @@
+"""Calculator: needs no data at all."""
+import streamlit as st
+
+
+def render():
+    st.title("🧮 Calculator")
+    
+    if "calc_input" not in st.session_state:
+        st.session_state.calc_input = ""
+
+    def btn_click(val):
+        st.session_state.calc_input += str(val)
+    def calc_clear():
+        st.session_state.calc_input = ""
+    def calc_back():
+        st.session_state.calc_input = st.session_state.calc_input[:-1]
+    def calc_result():
+        try:
+            st.session_state.calc_input = str(eval(st.session_state.calc_input))
+        except:
+            st.session_state.calc_input = "Error"
+
+    st.markdown(f"""
+    <div style="background-color: #000; padding: 20px; border-radius: 10px; text-align: right; font-family: monospace; font-size: 3rem; color: white; margin-bottom: 20px; border: 1px solid #333;">
+        {st.session_state.calc_input if st.session_state.calc_input else "0"}
+    </div>
+    """, unsafe_allow_html=True)
+
+    b1, b2, b3, b4 = st.columns(4)
+    with b1: st.button("C", on_click=calc_clear, use_container_width=True)
+    with b2: st.button("⌫", on_click=calc_back, use_container_width=True)
+    with b3: st.button("%", on_click=btn_click, args=("/100",), use_container_width=True)
+    with b4: st.button("÷", on_click=btn_click, args=("/",), use_container_width=True)
+
+    b1, b2, b3, b4 = st.columns(4)
+    with b1: st.button("7", on_click=btn_click, args=("7",), use_container_width=True)
+    with b2: st.button("8", on_click=btn_click, args=("8",), use_container_width=True)
+    with b3: st.button("9", on_click=btn_click, args=("9",), use_container_width=True)
+    with b4: st.button("×", on_click=btn_click, args=("*",), use_container_width=True)
+
+    b1, b2, b3, b4 = st.columns(4)
+    with b1: st.button("4", on_click=btn_click, args=("4",), use_container_width=True)
+    with b2: st.button("5", on_click=btn_click, args=("5",), use_container_width=True)
+    with b3: st.button("6", on_click=btn_click, args=("6",), use_container_width=True)
+    with b4: st.button("–", on_click=btn_click, args=("-",), use_container_width=True)
+
+    b1, b2, b3, b4 = st.columns(4)
+    with b1: st.button("1", on_click=btn_click, args=("1",), use_container_width=True)
+    with b2: st.button("2", on_click=btn_click, args=("2",), use_container_width=True)
+    with b3: st.button("3", on_click=btn_click, args=("3",), use_container_width=True)
+    with b4: st.button("+", on_click=btn_click, args=("+",), use_container_width=True)
+
+    b1, b2, b3, b4 = st.columns(4)
+    with b1: st.button("00", on_click=btn_click, args=("00",), use_container_width=True)
+    with b2: st.button("0", on_click=btn_click, args=("0",), use_container_width=True)
+    with b3: st.button(".", on_click=btn_click, args=(".",), use_container_width=True)
+    with b4: st.button("=", on_click=calc_result, type="primary", use_container_width=True)
@@ -0,0 +1,211 @@
+"""Expenses: balance cards, the add form, the delete tool, the paged transactions editor and backups."""
+import pandas as pd
+import streamlit as st
+
+from kharch import profiling
+from kharch.budgets import THRESHOLD_CHOICES, Budgets
+from kharch.export import available_formats, export_bytes, file_name, load_frames, mime_type
+from kharch.search import MATCH_LIMIT
+from kharch.session import budget_alerts, current_month, editor_key, get_budget_store, get_categories, get_ist_date, get_storage, get_totals, load_table, loaded_from, mark_changed, on_editor_change, search_index
+from kharch.storage import ALL_HISTORY, TABLES, concat_rows, enforce_schema, with_new_ids
+from kharch.views import PAGE_SIZES, filter_rows, for_display, page_count, page_of, row_label
+
+
+@st.cache_data(max_entries=1)
+def cached_export(versions, fmt, start, end, _frames):
+    # versions are the shared versions of _frames, so an unchanged book is served without re-serializing.
+    # Each entry is a whole export in memory, so only the latest is kept.
+    return export_bytes(_frames, fmt, start, end)
+
+
+def backup_export(tables, fmt, start=None, end=None):
+    # The export is only built when the download is clicked, on streamlit's download thread
+    storage, pending = get_storage(), st.session_state.pending
+
+    def build():
+        pending.flush(force=True)
+        frames = load_frames(storage, tables)
+        versions = tuple((table, version) for table, (_, version) in frames.items())
+        return cached_export(versions, fmt, start, end, {table: df for table, (df, _) in frames.items()})
+    return build
+
+
+def render():
+    storage = get_storage()
+    df_expenses = load_table("expenses")
+    combined_categories = get_categories()
+    totals = get_totals()
+    bal_cash, bal_online = totals.bal_cash, totals.bal_online
+    today_spent, total_spent = totals.spent_on(get_ist_date()), totals.total_spent
+
+    # Title (Since we don't have the top selectbox anymore)
+    st.title("📝 Expenses")
+    
+    # Dashboard Cards
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Cash Bal</div><div class="metric-value green-text">₹{bal_cash:,.0f}</div></div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Online Bal</div><div class="metric-value blue-text">₹{bal_online:,.0f}</div></div>""", unsafe_allow_html=True)
+    with c3:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Today</div><div class="metric-value red-text">₹{today_spent:,.0f}</div></div>""", unsafe_allow_html=True)
+    with c4:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Total</div><div class="metric-value">₹{total_spent:,.0f}</div></div>""", unsafe_allow_html=True)
+
+    # Budget cards for this month, from the running (month, category) totals
+    for alert in budget_alerts():
+        st.toast(f"{alert.category}: {alert.threshold:.0%} of the {pd.Timestamp(alert.month):%B} budget used (₹{alert.spent / 100:,.0f} of ₹{alert.limit / 100:,.0f})", icon="🎯")
+    budgets = get_budget_store().load()
+    budget_rows = budgets.status(totals.spent_by_month, current_month())
+    for start in range(0, len(budget_rows), 4):
+        for col, (category, spent, limit, level) in zip(st.columns(4), budget_rows[start:start + 4]):
+            color = "green-text" if level is None else "red-text" if level >= 1 else "amber-text"
+            with col:
+                st.markdown(f"""<div class="metric-card"><div class="metric-label">{category} · {spent / limit:.0%}</div><div class="metric-value {color}">₹{spent / 100:,.0f} / ₹{limit / 100:,.0f}</div></div>""", unsafe_allow_html=True)
+
+
+    # Add Expense Form
+    with st.container(border=True):
+        st.subheader("Add New Expense")
+        with st.form("add_expense_form", clear_on_submit=True):
+            item = st.text_input("Description", placeholder="e.g. Vegetables")
+            
+            c_cat, c_amt = st.columns(2)
+            with c_cat:
+                cat_selection = st.selectbox("Category", combined_categories)
+            with c_amt:
+                amount = st.number_input("Amount (₹)", min_value=0.0, step=0.01, format="%.2f", value=None)
+            
+            if cat_selection == "Other":
+                 custom_category = st.text_input("New Category Name")
+            else:
+                 custom_category = None
+            
+            c_mode, c_date = st.columns(2)
+            with c_mode:
+                mode = st.radio("Mode", ["Online", "Cash"], horizontal=True)
+            with c_date:
+                date = st.date_input("Date", value=get_ist_date())
+
+            if st.form_submit_button("Add Expense", type="primary", use_container_width=True):
+                final_cat = custom_category.strip() if cat_selection == "Other" and custom_category else cat_selection
+                
+                if item and amount is not None and amount > 0:
+                    new_entry = pd.DataFrame([{
+                        "Date": date, "Item": item, "Category": final_cat, "Amount": amount, "Mode": mode
+                    }])
+                    new_entry = with_new_ids(enforce_schema(new_entry), st.session_state.expenses)
+                    st.session_state.expenses = concat_rows(new_entry, st.session_state.expenses)
+                    mark_changed("expenses", new_rows=new_entry)
+                    st.session_state.pending.add("expenses", st.session_state.expenses, st.session_state.base_versions.get("expenses"), new_ids=new_entry.index)
+                    totals.add_expenses(new_entry)
+                    st.toast("Saved!", icon="✅")
+                    st.rerun()
+                else:
+                    st.error("Enter details")
+
+    # Table
+    st.write("### Transactions")
+    with st.expander("🗑️ Delete Tool"):
+        if not df_expenses.empty:
+            del_query = st.text_input("Find item", placeholder="Search description or #id", label_visibility="collapsed")
+            # The index is only built once something is typed
+            matches = search_index("expenses").search(df_expenses, del_query) if del_query.strip() else df_expenses.head(MATCH_LIMIT)
+            if not matches.empty:
+                sel_del = st.selectbox("Select item", matches.index, format_func=lambda i: row_label(i, matches.loc[i]), label_visibility="collapsed")
+                if st.button("Delete Selected", type="primary"):
+                    totals.remove_expenses(df_expenses.loc[[sel_del]])
+                    st.session_state.expenses = df_expenses.drop(sel_del)
+                    mark_changed("expenses", old_rows=df_expenses.loc[[sel_del]])
+                    st.session_state.pending.add("expenses", st.session_state.expenses, st.session_state.base_versions.get("expenses"), delete_ids=[sel_del])
+                    st.rerun()
+            else:
+                st.info("No match")
+        else:
+            st.info("Empty")
+
+    f_dates, f_cats, f_modes = st.columns([2, 2, 1])
+    with f_dates:
+        filter_dates = st.date_input("Dates", value=(), format="DD/MM/YYYY")
+    with f_cats:
+        filter_cats = st.multiselect("Category", combined_categories)
+    with f_modes:
+        filter_modes = st.multiselect("Mode", ["Online", "Cash"])
+    if filter_dates:
+        # Older months are only read when a date filter reaches them
+        df_expenses = load_table("expenses", since=filter_dates[0])
+    if loaded_from("expenses") > storage.window_start(ALL_HISTORY):
+        h_info, h_load = st.columns([3, 1])
+        with h_info:
+            st.caption(f"Showing transactions from {pd.Timestamp(loaded_from('expenses')):%B %Y} on")
+        with h_load:
+            st.button("Load older", on_click=load_table, args=("expenses", ALL_HISTORY), use_container_width=True)
+    df_view = filter_rows(df_expenses, filter_dates, filter_cats, filter_modes)
+
+    p_size, p_num, p_info = st.columns([1, 1, 2])
+    with p_size:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+    with p_num:
+        page = st.number_input("Page", min_value=1, max_value=page_count(len(df_view), page_size), value=1)
+    df_page = page_of(df_view, page, page_size)
+    with p_info:
+        first = (page - 1) * page_size
+        st.caption(f"Showing {first + 1 if len(df_page) else 0}–{first + len(df_page)} of {len(df_view)}")
+
+    with profiling.span("data_editor expenses"):
+        st.data_editor(
+            for_display(df_page),
+            key=editor_key("expenses"),
+            on_change=on_editor_change,
+            args=("expenses", df_page.index),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Amount": st.column_config.NumberColumn(format="₹%.2f"),
+                "Date": st.column_config.DateColumn(format="DD MMM"),
+                "Category": st.column_config.SelectboxColumn(options=combined_categories, required=True),
+                "Mode": st.column_config.SelectboxColumn(options=["Online", "Cash"], required=True)
+            }
+        )
+
+    st.divider()
+    with st.expander("🎯 Budgets"):
+        budget_table = pd.DataFrame({"Category": list(budgets.limits), "Monthly limit": [v / 100 for v in budgets.limits.values()]})
+        edited_budgets = st.data_editor(
+            budget_table,
+            key="budgets_editor",
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Category": st.column_config.SelectboxColumn(options=combined_categories, required=True),
+                "Monthly limit": st.column_config.NumberColumn(format="₹%.0f", min_value=0, required=True)
+            }
+        )
+        thresholds = st.multiselect("Warn at", THRESHOLD_CHOICES, default=[t for t in budgets.thresholds if t in THRESHOLD_CHOICES], format_func="{:.0%}".format)
+        if st.button("Save budgets"):
+            edited_budgets = edited_budgets.dropna()
+            limits = {str(c): round(float(v) * 100) for c, v in zip(edited_budgets["Category"], edited_budgets["Monthly limit"]) if v > 0}
+            get_budget_store().save(Budgets(limits, thresholds, budgets.alerted))
+            # Re-check this month against the new limits on the next rerun
+            totals.touched = None
+            st.rerun()
+
+    with st.expander("📥 Backup"):
+        b_tables, b_format, b_dates = st.columns([2, 1, 2])
+        with b_tables:
+            export_tables = st.multiselect("Tables", list(TABLES), default=list(TABLES))
+        with b_format:
+            export_format = st.selectbox("Format", available_formats())
+        with b_dates:
+            export_dates = st.date_input("Dates (optional)", value=(), format="DD/MM/YYYY", key="export_dates")
+        st.download_button(
+            "📥 Download backup",
+            data=backup_export(export_tables, export_format, *export_dates),
+            file_name=file_name(export_tables or ["expenses"], export_format),
+            mime=mime_type(export_tables or ["expenses"], export_format),
+            disabled=not export_tables,
+            on_click="ignore",
+            use_container_width=True
+        )
@@ -0,0 +1,28 @@
+"""Funds History: the funds editor."""
+import streamlit as st
+
+from kharch import profiling
+from kharch.session import editor_key, load_table, on_editor_change
+from kharch.storage import ALL_HISTORY
+from kharch.views import for_display
+
+
+def render():
+    df_funds = load_table("funds", since=ALL_HISTORY)
+
+    st.title("💰 Funds History")
+    
+    with profiling.span("data_editor funds"):
+        st.data_editor(
+            for_display(df_funds),
+            key=editor_key("funds"),
+            on_change=on_editor_change,
+            args=("funds",),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Amount": st.column_config.NumberColumn(format="₹%.2f"),
+                "Date": st.column_config.DateColumn(format="DD MMM YYYY")
+            }
+        )
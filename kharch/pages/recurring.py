@@ -0,0 +1,74 @@
+"""Recurring: rules for rent, subscriptions and salary, written by the catch-up pass."""
+import pandas as pd
+import streamlit as st
+
+from kharch.recurring import FREQUENCIES, next_due
+from kharch.session import get_categories, get_ist_date, get_recurring_store, run_recurring
+
+
+def render():
+    store = get_recurring_store()
+    combined_categories = get_categories()
+
+    st.title("🔁 Recurring")
+    st.caption("Due entries are added when the app starts, or by `python -m kharch.recurring` from cron.")
+
+    with st.container(border=True):
+        st.subheader("Add Rule")
+        r_kind = st.radio("Type", ["Expense", "Money In"], horizontal=True)
+        with st.form("add_rule_form", clear_on_submit=True):
+            r_item = st.text_input("Description" if r_kind == "Expense" else "Source", placeholder="e.g. Rent" if r_kind == "Expense" else "e.g. Salary")
+            c_amt, c_every = st.columns(2)
+            with c_amt:
+                r_amount = st.number_input("Amount (₹)", min_value=0.0, step=0.01, format="%.2f", value=None)
+            with c_every:
+                r_every = st.selectbox("Every", list(FREQUENCIES), index=list(FREQUENCIES).index("monthly"), format_func=str.capitalize)
+            r_category = st.selectbox("Category", combined_categories) if r_kind == "Expense" else None
+            r_mode = st.radio("Mode", ["Online", "Cash"], horizontal=True)
+            c_start, c_end = st.columns(2)
+            with c_start:
+                r_start = st.date_input("Starts", value=get_ist_date())
+            with c_end:
+                r_end = st.date_input("Ends (optional)", value=None)
+
+            if st.form_submit_button("Add Rule", type="primary", use_container_width=True):
+                if r_item and r_amount is not None and r_amount > 0 and (r_end is None or r_end >= r_start):
+                    store.add_rule("expenses" if r_kind == "Expense" else "funds", r_item, round(r_amount * 100), r_mode,
+                                   r_every, r_start, r_category, r_end)
+                    # A start in the past or today is due straight away
+                    added = run_recurring()
+                    st.toast(f"Rule added · {sum(added.values()):,} entries written", icon="🔁")
+                    st.rerun()
+                else:
+                    st.error("Enter details")
+
+    rules = store.load()["rules"]
+    if not rules:
+        st.info("No recurring rules yet.")
+        return
+    st.write("### Rules")
+    st.dataframe(
+        pd.DataFrame({
+            "Type": ["Expense" if r["table"] == "expenses" else "Money In" for r in rules],
+            "Item": [r["item"] for r in rules],
+            "Category": [r.get("category") or "" for r in rules],
+            "Amount": [r["amount"] / 100 for r in rules],
+            "Mode": [r["mode"] for r in rules],
+            "Every": [r["every"].capitalize() for r in rules],
+            "Next": next_due(rules),
+            "Written": [r["done"] for r in rules],
+        }),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Amount": st.column_config.NumberColumn(format="₹%.2f"),
+            "Next": st.column_config.DateColumn(format="DD MMM YYYY"),
+        }
+    )
+    with st.expander("🗑️ Remove Rules"):
+        labels = {r["id"]: f"{r['item']} · ₹{r['amount'] / 100:,.2f} {r['every']}" for r in rules}
+        remove_ids = st.multiselect("Rules", list(labels), format_func=labels.get, label_visibility="collapsed")
+        st.caption("Entries a rule already wrote stay in the book.")
+        if st.button("Remove Selected", disabled=not remove_ids):
+            store.remove_rules(remove_ids)
+            st.rerun()
@@ -0,0 +1,49 @@
+"""Search: one box over expenses, funds and the to-buy list, with amount and date filters."""
+import streamlit as st
+
+from kharch import profiling
+from kharch.search import MATCH_LIMIT
+from kharch.session import load_table, search_index
+from kharch.storage import ALL_HISTORY
+
+TABLE_LABELS = {"expenses": "📝 Expenses", "funds": "💰 Funds", "todo": "🛒 To-Buy List"}
+
+
+def render():
+    st.title("🔎 Search")
+    query = st.text_input("Search", placeholder="Words or their beginnings, e.g. swig, elec bill; #id for one row", label_visibility="collapsed")
+
+    f_tables, f_min, f_max, f_dates = st.columns([2, 1, 1, 2])
+    with f_tables:
+        tables = st.multiselect("In", list(TABLE_LABELS), default=list(TABLE_LABELS), format_func=TABLE_LABELS.get)
+    with f_min:
+        amount_min = st.number_input("Min ₹", min_value=0.0, step=100.0, value=None)
+    with f_max:
+        amount_max = st.number_input("Max ₹", min_value=0.0, step=100.0, value=None)
+    with f_dates:
+        search_dates = st.date_input("Dates", value=(), format="DD/MM/YYYY")
+
+    if not query.strip() and amount_min is None and amount_max is None and not search_dates:
+        st.info("Type to search")
+        return
+
+    for table in tables:
+        df = load_table(table, since=ALL_HISTORY)
+        with profiling.span(f"search {table}"):
+            hits = search_index(table).search(df, query, (amount_min, amount_max), search_dates)
+        more = "+" if len(hits) == MATCH_LIMIT else ""
+        st.markdown(f"##### {TABLE_LABELS[table]} · {len(hits)}{more}")
+        if hits.empty:
+            st.caption("No match")
+            continue
+        if 'Amount' in hits.columns:
+            hits = hits.assign(Amount=hits['Amount'].astype('float64') / 100)
+        # Row ids are kept as the index so a hit can be found again as #id
+        st.dataframe(
+            hits,
+            use_container_width=True,
+            column_config={
+                "Amount": st.column_config.NumberColumn(format="₹%.2f"),
+                "Date": st.column_config.DateColumn(format="DD MMM YYYY")
+            }
+        )
@@ -0,0 +1,48 @@
+"""Import: bank/UPI statement upload with column mapping."""
+import pandas as pd
+import streamlit as st
+
+from kharch.importer import detect_mapping, import_statement
+from kharch.session import get_categories, get_storage
+from kharch.storage import TABLES
+
+
+def render():
+    storage = get_storage()
+    combined_categories = get_categories()
+
+    st.title("📥 Import Statement")
+    st.caption("Upload a bank or UPI statement CSV. Transactions already in the book are skipped.")
+
+    uploaded = st.file_uploader("Statement CSV", type=["csv"])
+    if uploaded is not None:
+        statement_columns = [str(c) for c in pd.read_csv(uploaded, nrows=0).columns]
+        uploaded.seek(0)
+        guess = detect_mapping(statement_columns)
+        options = ["—"] + statement_columns
+        mapping = {}
+        for col_ui, field in zip(st.columns(len(TABLES["expenses"][1])), TABLES["expenses"][1]):
+            with col_ui:
+                choice = st.selectbox(field, options, index=options.index(guess[field]) if field in guess else 0)
+                if choice != "—":
+                    mapping[field] = choice
+
+        c_cat, c_mode = st.columns(2)
+        with c_cat:
+            import_category = st.selectbox("Category for unmapped rows", combined_categories, index=len(combined_categories) - 1)
+        with c_mode:
+            import_mode = st.radio("Mode for unmapped rows", ["Online", "Cash"], horizontal=True)
+        import_dayfirst = st.checkbox("Dates are day-first (DD/MM/YYYY)", value=True)
+        import_signed = st.checkbox("Spends are negative amounts")
+
+        if st.button("Import", type="primary", use_container_width=True):
+            st.session_state.pending.flush(force=True)
+            try:
+                with st.spinner("Importing…"):
+                    result = import_statement(uploaded, storage, mapping, import_category, import_mode,
+                                              import_dayfirst, import_signed, base_version=st.session_state.base_versions.get("expenses"))
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state.base_versions["expenses"] = result.version
+                st.success(f"Imported {result.added:,} transactions · skipped {result.duplicates:,} duplicates · {result.skipped:,} rows were not spends")
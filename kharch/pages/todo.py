@@ -0,0 +1,63 @@
+"""To-Buy List: the shopping list editor and clean-up."""
+import pandas as pd
+import streamlit as st
+
+from kharch import profiling
+from kharch.session import editor_key, load_table, mark_changed, on_editor_change
+
+
+def render():
+    df_todo = load_table("todo")
+
+    if "todo_title" not in st.session_state:
+        st.session_state.todo_title = "🛍️ Shopping List"
+    
+    col_t1, col_t2 = st.columns([3, 1])
+    with col_t1:
+        new_title = st.text_input("List Name", value=st.session_state.todo_title, label_visibility="collapsed")
+        if new_title != st.session_state.todo_title:
+            st.session_state.todo_title = new_title
+    
+    st.title(st.session_state.todo_title)
+    st.caption("Tick items when bought, then click 'Clean Up' to remove them.")
+
+    if not df_todo.empty:
+        # Work on a copy; st.session_state.todo is the shared read-only frame
+        df_todo = df_todo.assign(
+            Done=df_todo["Done"].fillna(False).astype(bool),
+            Item=df_todo["Item"].fillna("").astype(str),
+            Notes=df_todo["Notes"].fillna("").astype(str)
+        )
+    else:
+        df_todo = pd.DataFrame(columns=["Done", "Item", "Notes"])
+        df_todo["Done"] = df_todo["Done"].astype(bool)
+        df_todo["Item"] = df_todo["Item"].astype(str)
+        df_todo["Notes"] = df_todo["Notes"].astype(str)
+
+    with profiling.span("data_editor todo"):
+        st.data_editor(
+            df_todo,
+            key=editor_key("todo"),
+            on_change=on_editor_change,
+            args=("todo",),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Done": st.column_config.CheckboxColumn("Bought?", default=False, width="small"),
+                "Item": st.column_config.TextColumn("Item Name", width="medium", required=True),
+                "Notes": st.column_config.TextColumn("Notes", width="large")
+            }
+        )
+
+    if not df_todo.empty and df_todo['Done'].any():
+        st.write("")
+        col_clean1, col_clean2 = st.columns([1, 4])
+        with col_clean1:
+            if st.button("🗑️ Clean Up", type="primary", help="Remove all checked items"):
+                done_ids = df_todo.index[df_todo['Done']]
+                st.session_state.todo = df_todo.drop(done_ids)
+                mark_changed("todo", old_rows=df_todo.loc[done_ids])
+                st.session_state.pending.add("todo", st.session_state.todo, st.session_state.base_versions.get("todo"), delete_ids=done_ids)
+                st.toast("Cleaned!", icon="🧹")
+                st.rerun()
@@ -0,0 +1,114 @@
+"""Wallet: balances, adding money, Cash/Online transfers and the balance history."""
+import pandas as pd
+import streamlit as st
+
+from kharch.session import get_ist_date, get_storage, get_totals, load_table, loaded_from, mark_changed
+from kharch.storage import concat_rows, enforce_schema, with_new_ids
+
+
+def month_rows(table, month):
+    # A month the session's frame holds in full comes from the frame, unsaved edits included. Only a month
+    # before a windowed table's window is read back from storage, and our edits are saved first for that.
+    storage = get_storage()
+    df = load_table(table)
+    if table not in storage.windowed_tables:
+        return storage.month_rows(table, month, df)
+    if month >= loaded_from(table):
+        start = pd.Timestamp(month)
+        return df[(df['Date'] >= start) & (df['Date'] < start + pd.offsets.MonthBegin())]
+    if st.session_state.pending.has(table):
+        st.session_state.pending.flush(force=True)
+    return storage.month_rows(table, month, df)
+
+
+def render():
+    df_funds = load_table("funds")
+    totals = get_totals()
+    bal_cash, bal_online = totals.bal_cash, totals.bal_online
+
+    st.title("💳 Wallet")
+    
+    # Balances
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Cash</div><div class="metric-value green-text">₹{bal_cash:,.2f}</div></div>""", unsafe_allow_html=True)
+    with c2:
+        st.markdown(f"""<div class="metric-card"><div class="metric-label">Online</div><div class="metric-value blue-text">₹{bal_online:,.2f}</div></div>""", unsafe_allow_html=True)
+
+    tab_add, tab_exchange, tab_history = st.tabs(["➕ Add", "💱 Transfer", "📈 History"])
+    
+    with tab_add:
+        with st.form("add_funds_form", clear_on_submit=True):
+            f_amount = st.number_input("Amount (₹)", min_value=0.0, step=0.01, format="%.2f", value=None)
+            f_mode = st.radio("To", ["Online", "Cash"], horizontal=True)
+            f_source = st.text_input("Source", placeholder="Salary, ATM")
+            f_date = st.date_input("Date", value=get_ist_date())
+            
+            if st.form_submit_button("Add Money", type="primary", use_container_width=True):
+                if f_amount is not None and f_amount > 0:
+                    new_fund = pd.DataFrame([{
+                        "Date": f_date,
+                        "Source": f_source if f_source else "Add",
+                        "Mode": "Online" if "Online" in f_mode else "Cash",
+                        "Amount": f_amount
+                    }])
+                    new_fund = with_new_ids(enforce_schema(new_fund), df_funds)
+                    df_funds = concat_rows(new_fund, df_funds)
+                    st.session_state.funds = df_funds
+                    mark_changed("funds", new_rows=new_fund)
+                    st.session_state.pending.add("funds", df_funds, st.session_state.base_versions.get("funds"), new_ids=new_fund.index)
+                    totals.add_funds(new_fund)
+                    st.toast("Added!", icon="💰")
+                    st.rerun()
+
+    with tab_exchange:
+        with st.form("transfer_form", clear_on_submit=True):
+            t_amount = st.number_input("Amount (₹)", min_value=0.0, step=0.01, format="%.2f", value=None)
+            t_direction = st.radio("Type", ["Online ➔ Cash", "Cash ➔ Online"], horizontal=True)
+            t_note = st.text_input("Note")
+            t_date = st.date_input("Date", value=get_ist_date())
+            
+            if st.form_submit_button("Transfer", type="primary", use_container_width=True):
+                if t_amount is not None and t_amount > 0:
+                    if "Online ➔ Cash" in t_direction:
+                        src, dst = "Online", "Cash"
+                    else:
+                        src, dst = "Cash", "Online"
+                    
+                    row_out = {"Date": t_date, "Source": f"Transfer to {dst}", "Mode": src, "Amount": -t_amount}
+                    row_in = {"Date": t_date, "Source": f"Transfer from {src}", "Mode": dst, "Amount": t_amount}
+                    
+                    new_transfer = with_new_ids(enforce_schema(pd.DataFrame([row_out, row_in])), st.session_state.funds)
+                    st.session_state.funds = concat_rows(new_transfer, st.session_state.funds)
+                    mark_changed("funds", new_rows=new_transfer)
+                    st.session_state.pending.add("funds", st.session_state.funds, st.session_state.base_versions.get("funds"), new_ids=new_transfer.index)
+                    totals.add_funds(new_transfer)
+                    st.toast("Done!", icon="✅")
+                    st.rerun()
+
+    with tab_history:
+        ledger = totals.ledger
+        balance_day = st.date_input("Balance on", value=get_ist_date(), format="DD/MM/YYYY")
+        # One month of rows on top of the previous month-end checkpoint
+        balance = ledger.balance_on(balance_day, month_rows)
+        h1, h2 = st.columns(2)
+        with h1:
+            st.metric("Cash", f"₹{balance['Cash'] / 100:,.2f}")
+        with h2:
+            st.metric("Online", f"₹{balance['Online'] / 100:,.2f}")
+
+        history = ledger.history()
+        if history.empty:
+            st.info("No history yet")
+        else:
+            # One point per month from the checkpoints; a plain vega-lite spec keeps altair off this page
+            st.vega_lite_chart(history, {
+                "mark": {"type": "line", "point": True},
+                "encoding": {
+                    "x": {"field": "Date", "type": "temporal", "title": None},
+                    "y": {"field": "Balance", "type": "quantitative", "title": "Month-end balance (₹)"},
+                    "color": {"field": "Account", "type": "nominal", "title": None},
+                    "tooltip": [{"field": "Date", "type": "temporal", "format": "%b %Y"}, {"field": "Account"},
+                                {"field": "Balance", "format": ",.2f"}],
+                },
+            }, use_container_width=True)
@@ -0,0 +1,136 @@
+"""Per-rerun timing spans and file byte counts.
+
+A run is started at the top of the script and finished at the bottom. In between, phase(name)
+marks the top-level section the script is in and span(name) times a nested block. Storage
+reports the bytes it reads and writes through count_read/count_written. With no run started
+(the default), every call is a thread-local lookup and nothing else.
+
+Runs are per thread, which is per session under streamlit. Set KHARCH_PROFILE=1 to profile
+every session; finished runs are appended as JSON lines to KHARCH_PROFILE_LOG
+(default kharch_profile.jsonl).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = "KHARCH_PROFILE"
+LOG_ENV = "KHARCH_PROFILE_LOG"
+LOG_FILE = "kharch_profile.jsonl"
+
+_local = threading.local()
+
+
+class RunProfile:
+    # Spans are kept in start order as [name, depth, seconds]; phases are depth 0
+
+    def __init__(self, label=None):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._phase = None
+
+    def _open(self, name, depth):
+        entry = [name, depth, None]
+        self.spans.append(entry)
+        return entry, time.perf_counter()
+
+    def _close_phase(self):
+        if self._phase is not None:
+            entry, start = self._phase
+            entry[2] = time.perf_counter() - start
+            self._phase = None
+
+    def set_phase(self, name):
+        self._close_phase()
+        self._phase = self._open(name, 0)
+
+    @contextmanager
+    def span(self, name):
+        self.depth += 1
+        entry, start = self._open(name, self.depth)
+        try:
+            yield
+        finally:
+            entry[2] = time.perf_counter() - start
+            self.depth -= 1
+
+    def finish(self):
+        self._close_phase()
+        return {
+            "ts": time.time(),
+            "label": self.label,
+            "seconds": time.perf_counter() - self.started,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "spans": [{"name": name, "depth": depth, "seconds": seconds} for name, depth, seconds in self.spans],
+        }
+
+
+class _NoSpan:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enabled_by_env():
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+def log_path():
+    return os.environ.get(LOG_ENV, LOG_FILE)
+
+
+def start_run(label=None):
+    _local.run = RunProfile(label)
+    return _local.run
+
+
+def finish_run(label=None, log=None, ended_by=None):
+    # Ends this thread's run and returns its record; log is a JSONL path to append it to.
+    # ended_by names the exception that cut the run short (st.rerun/st.stop raise one).
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    if label is not None:
+        run.label = label
+    record = run.finish()
+    if ended_by is not None:
+        record["ended_by"] = ended_by
+    if log:
+        with open(log, "a") as fh:
+            fh.write(json.dumps(record) + "\n")
+    return record
+
+
+def phase(name):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.set_phase(name)
+
+
+def span(name):
+    run = getattr(_local, "run", None)
+    return _NO_SPAN if run is None else run.span(name)
+
+
+def count_read(nbytes):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.bytes_read += nbytes
+
+
+def count_written(nbytes):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.bytes_written += nbytes
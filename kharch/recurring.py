@@ -0,0 +1,190 @@
+"""Recurring expenses and funds: rent, subscriptions, salary.
+
+Rules live in recurring.json in the data directory, next to expenses.csv:
+
+    {"rules": [{"id": 1, "table": "expenses", "item": "Rent", "category": "Bills", "amount": 1500000,
+                "mode": "Online", "every": "monthly", "start": "2026-01-05", "end": null, "done": 9}],
+     "last_run": "2026-10-17"}
+
+Occurrence k of a rule falls k days, weeks or months after start (a monthly rule on the 31st falls
+on the last day of shorter months) and done counts the occurrences already written. A catch-up pass
+works out every occurrence from done up to today for all rules at once, however long the app was not
+running, writes them with one append per table and advances done, all under the file's lock, so a
+second pass (another session, or cron) adds nothing. done is saved before the rows are written and
+put back if a write fails: a crash between the two can skip a batch, never repeat one.
+
+    python -m kharch.recurring [--data-dir .] [--backend csv|sqlite|monthly] [--today 2026-10-17]
+"""
+import argparse
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from kharch.storage import (EXPENSE_COLUMNS, FUNDS_COLUMNS, JsonFile, concat_rows, enforce_schema, get_backend,
+                            with_new_ids)
+
+RECURRING_FILE = 'recurring.json'
+# every -> step in days; monthly rules step by calendar month instead
+FREQUENCIES = {"daily": 1, "weekly": 7, "monthly": None}
+# Rule tables -> the column a rule's item fills
+ITEM_COLUMNS = {"expenses": "Item", "funds": "Source"}
+
+CatchUp = namedtuple("CatchUp", ["added", "versions"])
+
+
+def today_ist():
+    # The app's day (see session.get_ist_date), also for a cron job on a UTC host
+    return (datetime.utcnow() + timedelta(hours=5, minutes=30)).date()
+
+
+def _month_length(months):
+    return ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype('int64')
+
+
+def occurrence_dates(starts, every, k):
+    # Date of occurrence k of each rule; starts/every/k are equal-length arrays
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    k = np.asarray(k, dtype='int64')
+    steps = np.array([FREQUENCIES[e] or 0 for e in every], dtype='int64')
+    by_days = starts + k * steps
+    start_months = starts.astype('datetime64[M]')
+    day = (starts - start_months.astype('datetime64[D]')).astype('int64')
+    months = start_months + k
+    by_months = months.astype('datetime64[D]') + np.minimum(day, _month_length(months) - 1)
+    return np.where(steps > 0, by_days, by_months)
+
+
+def occurrence_counts(starts, every, through):
+    # Number of occurrences of each rule on or before through (an array of dates, one per rule)
+    starts = np.asarray(starts, dtype='datetime64[D]')
+    through = np.asarray(through, dtype='datetime64[D]')
+    steps = np.array([FREQUENCIES[e] or 0 for e in every], dtype='int64')
+    days = (through - starts).astype('int64')
+    by_days = days // np.maximum(steps, 1) + 1
+    months = (through.astype('datetime64[M]') - starts.astype('datetime64[M]')).astype('int64')
+    # The occurrence in through's month may still be ahead of through
+    by_months = months + (occurrence_dates(starts, every, months) <= through)
+    return np.where(days < 0, 0, np.where(steps > 0, by_days, by_months))
+
+
+def due_rows(rules, today):
+    # Every occurrence from each rule's done up to today: (table -> new rows newest first, rule id -> new done)
+    if not rules:
+        return {}, {}
+    rules = pd.DataFrame(rules)
+    starts = pd.to_datetime(rules["start"]).to_numpy().astype('datetime64[D]')
+    today = np.datetime64(today, 'D')
+    ends = pd.to_datetime(rules["end"]).to_numpy().astype('datetime64[D]') if "end" in rules else np.full(len(rules), today)
+    through = np.where(np.isnat(ends), today, np.minimum(ends, today))
+    every = rules["every"].to_numpy()
+    done = rules["done"].fillna(0).to_numpy(dtype='int64')
+    counts = occurrence_counts(starts, every, through)
+    n = np.maximum(counts - done, 0)
+    # One row per due occurrence: rule position and occurrence number k, done..count-1 for each rule
+    at = np.repeat(np.arange(len(rules)), n)
+    k = done[at] + np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    dates = occurrence_dates(starts[at], every[at], k)
+    due = rules.iloc[at].reset_index(drop=True)
+    frames = {}
+    for table, item_column in ITEM_COLUMNS.items():
+        mask = (due["table"] == table).to_numpy()
+        if not mask.any():
+            continue
+        rows = pd.DataFrame({
+            "Date": dates[mask].astype('datetime64[ns]'),
+            item_column: due.loc[mask, "item"].to_numpy(),
+            "Category": due.loc[mask, "category"].to_numpy() if "category" in due else "Other",
+            "Amount": pd.array(due.loc[mask, "amount"].to_numpy(), dtype='Int64'),
+            "Mode": due.loc[mask, "mode"].to_numpy(),
+        }, columns=EXPENSE_COLUMNS if table == "expenses" else FUNDS_COLUMNS)
+        frames[table] = enforce_schema(rows.sort_values("Date", ascending=False, kind="stable", ignore_index=True))
+    return frames, {int(rule_id): int(c) for rule_id, c, m in zip(rules["id"], counts, n) if m}
+
+
+def next_due(rules):
+    # Date of each rule's next occurrence, None once it is past the rule's end
+    if not rules:
+        return []
+    starts = [r["start"] for r in rules]
+    dates = occurrence_dates(starts, [r["every"] for r in rules], [r.get("done", 0) for r in rules])
+    return [None if r.get("end") and d > np.datetime64(r["end"], 'D') else pd.Timestamp(d).date()
+            for r, d in zip(rules, dates)]
+
+
+class RecurringStore:
+    # recurring.json of one data directory
+
+    def __init__(self, data_dir="."):
+        self.file = JsonFile(os.path.join(data_dir, RECURRING_FILE), {"rules": [], "last_run": None})
+        self.path = self.file.path
+
+    def load(self):
+        return self.file.load()
+
+    def add_rule(self, table, item, amount, mode, every, start, category=None, end=None):
+        # amount in paise. Occurrences before today are written by the next catch-up like any other missed ones.
+        if every not in FREQUENCIES:
+            raise ValueError(f"unknown frequency {every!r}")
+        with self.file.lock():
+            state = self.file.load()
+            rule = {"id": max([r["id"] for r in state["rules"]], default=0) + 1, "table": table, "item": item,
+                    "category": category if table == "expenses" else None, "amount": int(amount), "mode": mode,
+                    "every": every, "start": start.isoformat(), "end": end.isoformat() if end else None, "done": 0}
+            state["rules"].append(rule)
+            self.file.save(state)
+        return rule
+
+    def remove_rules(self, ids):
+        # Rows already written by the rules stay in the book
+        with self.file.lock():
+            state = self.file.load()
+            state["rules"] = [r for r in state["rules"] if r["id"] not in set(ids)]
+            self.file.save(state)
+
+    def is_due(self, today):
+        # Cheap check before catch_up(): any rule with an occurrence on or before today still unwritten
+        return any(d is not None and d <= today for d in next_due(self.load()["rules"]))
+
+    def catch_up(self, storage, today):
+        # Writes every due occurrence; returns CatchUp(table -> rows added, table -> new shared version)
+        with self.file.lock():
+            state = self.file.load()
+            frames, done = due_rows(state["rules"], today)
+            if not frames:
+                return CatchUp({}, {})
+            before = {r["id"]: r["done"] for r in state["rules"]}
+            for rule in state["rules"]:
+                rule["done"] = done.get(rule["id"], rule["done"])
+            state["last_run"] = today.isoformat()
+            self.file.save(state)
+            added, versions = {}, {}
+            for table, new_rows in frames.items():
+                try:
+                    df, version = storage.shared(table)
+                    new_rows = with_new_ids(new_rows, df)
+                    versions[table] = storage.append(table, new_rows, concat_rows(new_rows, df), version)
+                except BaseException:
+                    # These occurrences were not written, so they are still due
+                    for rule in state["rules"]:
+                        if rule["table"] == table:
+                            rule["done"] = before[rule["id"]]
+                    self.file.save(state)
+                    raise
+                added[table] = len(new_rows)
+        return CatchUp(added, versions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write every due recurring expense and fund (for cron)")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--backend", default=None, help="csv, sqlite or monthly (default: $KHARCH_BACKEND or csv)")
+    parser.add_argument("--today", type=date.fromisoformat, default=None, help="catch up to this day (default: today in IST)")
+    args = parser.parse_args()
+    result = RecurringStore(args.data_dir).catch_up(get_backend(args.backend, args.data_dir), args.today or today_ist())
+    if result.added:
+        print("Added " + " and ".join(f"{n:,} {table} rows" for table, n in result.added.items()))
+    else:
+        print("Nothing due")
@@ -0,0 +1,46 @@
+import pandas as pd
+
+GRANULARITIES = ["Auto", "Day", "Week", "Month", "Year"]
+MAX_TREND_POINTS = 120
+AXIS_FORMATS = {"Day": "%d %b", "Week": "%d %b", "Month": "%b %Y", "Year": "%Y"}
+
+
+def build_rollups(storage, df):
+    # Materialized totals for the Analysis page; callers cache the result per data version.
+    # The storage answers with its grouped queries (indexed GROUP BYs in SQLite, partition summaries
+    # in the monthly backend), so df only needs to be the session's frame, not the whole history.
+    daily = storage.daily_totals(df).dropna(subset=["Date"])
+    daily = (daily.set_index("Date")["Amount"].fillna(0).astype('int64') / 100).sort_index()
+    by_category = {}
+    for categories in storage.month_totals("expenses", "Category", df).values():
+        for category, amount in categories.items():
+            by_category[category] = by_category.get(category, 0) + amount
+    return {
+        "daily": daily,
+        "monthly": daily.resample('MS').sum(),
+        "category": pd.DataFrame({"Category": list(by_category), "Amount": [v / 100 for v in by_category.values()]}),
+    }
+
+
+def _series(rollups, granularity):
+    if granularity == "Day":
+        return rollups["daily"]
+    if granularity == "Week":
+        return rollups["daily"].resample('W-MON', label='left', closed='left').sum()
+    if granularity == "Month":
+        return rollups["monthly"]
+    return rollups["monthly"].resample('YS').sum()
+
+
+def trend(rollups, granularity="Auto"):
+    # Returns (granularity, frame); Auto picks the finest granularity that fits MAX_TREND_POINTS,
+    # an explicit one keeps only its most recent MAX_TREND_POINTS buckets
+    if granularity == "Auto":
+        for granularity in GRANULARITIES[1:]:
+            series = _series(rollups, granularity)
+            if len(series) <= MAX_TREND_POINTS:
+                break
+    else:
+        series = _series(rollups, granularity)
+    series = series.tail(MAX_TREND_POINTS)
+    return granularity, series.rename_axis("Date").rename("Amount").reset_index()
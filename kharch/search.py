@@ -0,0 +1,223 @@
+"""In-memory inverted index for searching the expenses, funds and to-buy tables.
+
+Text columns are split into lower-case word tokens and each token maps to the sorted row ids
+that contain it. Every query word is a prefix: the matching terms are a range of the sorted
+vocabulary, found by bisection, and their postings are unioned; the words are then intersected.
+Amount and date filters are applied to the few rows that remain, and results are ranked by how
+many query words matched a whole token, then newest first.
+
+An index is built once per frame and then moved by the same row deltas as the totals.
+"""
+import bisect
+import itertools
+import re
+
+import numpy as np
+import pandas as pd
+
+TOKEN = re.compile(r"\w+")
+MATCH_LIMIT = 50
+
+# Table -> columns the index covers
+SEARCH_COLUMNS = {
+    "expenses": ["Item", "Category"],
+    "funds": ["Source"],
+    "todo": ["Item", "Notes"],
+}
+
+_NO_IDS = np.empty(0, dtype='int64')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if isinstance(text, str) else []
+
+
+def _row_tokens(df, columns):
+    # token -> sorted row ids of df containing it. Each distinct cell value is tokenized once, so a column
+    # of repeated items or a categorical costs one regex per distinct value; the rows are expanded with numpy.
+    ids = df.index.to_numpy()
+    runs, value_codes, words = [], [], []
+    for col in columns:
+        if col not in df.columns or df.empty:
+            continue
+        codes, values = pd.factorize(df[col])
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        tokens = [TOKEN.findall(v.lower()) if isinstance(v, str) else [] for v in np.asarray(values, dtype=object).tolist()]
+        runs.append((order, bounds))
+        value_codes.append(np.repeat(np.arange(len(values)), [len(t) for t in tokens]))
+        words.append(list(itertools.chain.from_iterable(tokens)))
+    all_words = list(itertools.chain.from_iterable(words))
+    if not all_words:
+        return {}
+    token_codes, vocabulary = pd.factorize(np.array(all_words, dtype=object))
+    pair_tokens, pair_rows, done = [], [], 0
+    for (order, bounds), values, col_words in zip(runs, value_codes, words):
+        counts = bounds[values + 1] - bounds[values]
+        # Row positions of every (value, token) pair: each value's run in order, back to back
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_rows.append(ids[order[np.repeat(bounds[values], counts) + offsets]])
+        pair_tokens.append(np.repeat(token_codes[done:done + len(col_words)], counts))
+        done += len(col_words)
+    tokens, rows = np.concatenate(pair_tokens), np.concatenate(pair_rows)
+    by = np.lexsort((rows, tokens))
+    tokens, rows = tokens[by], rows[by]
+    # A token twice in a row (two columns, or a repeated word) is one posting
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (tokens[1:] != tokens[:-1]) | (rows[1:] != rows[:-1])
+    tokens, rows = tokens[keep], rows[keep]
+    cuts = np.searchsorted(tokens, np.arange(len(vocabulary) + 1))
+    return {token: rows[cuts[t]:cuts[t + 1]] for t, token in enumerate(vocabulary)}
+
+
+def _union(arrays):
+    # Sorted distinct ids of several sorted id arrays; sorting beats np.unique's hashing here
+    ids = np.sort(np.concatenate(arrays))
+    keep = np.ones(len(ids), dtype=bool)
+    keep[1:] = ids[1:] != ids[:-1]
+    return ids[keep]
+
+
+def _contains(sorted_ids, ids):
+    # Membership of ids in a sorted id array, by bisection
+    at = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+    return sorted_ids[at] == ids
+
+
+def _positions(df, ids):
+    # Frame positions of row ids (-1 where a row is not in df). Row ids are small non-negative
+    # integers, so one lookup array beats hashing each id through the index.
+    index = df.index.to_numpy()
+    if not len(index):
+        return np.full(len(ids), -1)
+    lookup = np.full(max(int(index.max()), int(ids.max(initial=0))) + 1, -1)
+    lookup[index] = np.arange(len(index))
+    return lookup[ids]
+
+
+class SearchIndex:
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.postings = {}      # token -> sorted int64 row ids
+        self.terms = []         # sorted vocabulary, for prefix ranges
+        self.version = None     # data version of the frame the index matches; set by the session
+
+    @classmethod
+    def build(cls, df, columns):
+        index = cls(columns)
+        index.postings = _row_tokens(df, columns)
+        index.terms = sorted(index.postings)
+        return index
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, rows):
+        for token, ids in _row_tokens(rows, self.columns).items():
+            if token in self.postings:
+                self.postings[token] = _union([self.postings[token], ids])
+            else:
+                self.postings[token] = ids
+                bisect.insort(self.terms, token)
+
+    def remove(self, rows):
+        for token, ids in _row_tokens(rows, self.columns).items():
+            if token not in self.postings:
+                continue
+            left = np.setdiff1d(self.postings[token], ids, assume_unique=True)
+            if len(left):
+                self.postings[token] = left
+            else:
+                del self.postings[token]
+                self.terms.pop(bisect.bisect_left(self.terms, token))
+
+    def replace(self, old_rows, new_rows):
+        # old_rows/new_rows as the editors report them: the touched rows before and after, indexed by row id
+        if old_rows is not None and len(old_rows):
+            self.remove(old_rows)
+        if new_rows is not None and len(new_rows):
+            self.add(new_rows)
+
+    def prefixed(self, prefix):
+        # Terms starting with prefix
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\U0010ffff", lo=start)
+        return self.terms[start:end]
+
+    def lookup(self, word):
+        terms = self.prefixed(word)
+        if not terms:
+            return _NO_IDS
+        if len(terms) == 1:
+            return self.postings[terms[0]]
+        return _union([self.postings[t] for t in terms])
+
+    def search(self, df, query="", amount_range=(None, None), date_range=(), limit=MATCH_LIMIT):
+        # The best matches of query among df's rows, at most limit of them; "#12" or "12" is row id 12.
+        # amount_range is in rupees (either end may be None); date_range is () or (start,) or (start, end).
+        # A filter on a column df does not have (the to-buy list has neither) matches nothing.
+        query = query.strip()
+        row_id = query.lstrip('#')
+        if row_id.isdigit():
+            return df.loc[df.index.intersection([int(row_id)])]
+        words = tokenize(query)
+        low, high = amount_range
+        by_amount, by_date = low is not None or high is not None, bool(date_range)
+        if (by_amount and 'Amount' not in df.columns) or (by_date and 'Date' not in df.columns):
+            return df.iloc[:0]
+        if not words and not (by_amount or by_date):
+            return df.head(limit)
+        if words:
+            ids = None
+            for word in words:
+                found = self.lookup(word)
+                ids = found if ids is None else np.intersect1d(ids, found, assume_unique=True)
+                if not len(ids):
+                    return df.iloc[:0]
+            # Rank: whole-word matches first, then newest
+            score = np.zeros(len(ids), dtype='int64')
+            for word in words:
+                if word in self.postings:
+                    score += _contains(self.postings[word], ids)
+            positions = _positions(df, ids)
+            score, positions = score[positions >= 0], positions[positions >= 0]
+        else:
+            positions = np.arange(len(df))
+            score = np.zeros(len(df), dtype='int64')
+
+        mask = np.ones(len(positions), dtype=bool)
+        if by_amount:
+            amounts = df['Amount'].to_numpy(dtype='float64', na_value=np.nan)[positions] / 100
+            if low is not None:
+                mask &= amounts >= low
+            if high is not None:
+                mask &= amounts <= high
+        if by_date:
+            dates = df['Date'].to_numpy()[positions]
+            mask &= dates >= np.datetime64(pd.Timestamp(date_range[0]))
+            if len(date_range) == 2:
+                mask &= dates <= np.datetime64(pd.Timestamp(date_range[1]))
+        positions, score = positions[mask], score[mask]
+
+        if 'Date' in df.columns:
+            newest = df['Date'].to_numpy()[positions].astype('int64')
+            newest[newest == np.iinfo('int64').min] = np.iinfo('int64').min + 1  # NaT ranks last
+        else:
+            newest = -positions
+        return df.iloc[positions[_top(score, newest, limit)]]
+
+
+def _top(score, newest, limit):
+    # Positions of the limit best by (score, newest), both descending, without sorting everything:
+    # each score level is cut down with argpartition before it is sorted
+    picked = []
+    for level in np.unique(score)[::-1]:
+        at = np.flatnonzero(score == level)
+        if len(at) > limit:
+            at = at[np.argpartition(-newest[at], limit)[:limit]]
+        picked.append(at[np.argsort(-newest[at], kind='stable')])
+        limit -= len(picked[-1])
+        if limit <= 0:
+            break
+    return np.concatenate(picked) if picked else np.empty(0, dtype='int64')
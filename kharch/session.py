@@ -0,0 +1,206 @@
+"""Per-session state shared by the app script and the page modules.
+
+Tables are refreshed from the shared frames the first time a rerun asks for them, so a page
+only pays for the data it actually shows. With the monthly and SQLite backends a session holds a
+window of recent months, widened on request (see load_table).
+"""
+from datetime import datetime, timedelta
+
+import streamlit as st
+
+from kharch import profiling
+from kharch.aggregates import LedgerTotals
+from kharch.budgets import BudgetStore
+from kharch.editing import PendingWrites, apply_editor_changes
+from kharch.recurring import RecurringStore
+from kharch.search import SEARCH_COLUMNS, SearchIndex
+from kharch.storage import TABLES, StorageError, file_signature, get_backend, next_version
+
+DEFAULT_CATEGORIES = ["Food", "Travel", "Bills", "Shopping", "Entertainment", "Other"]
+
+
+def get_ist_date():
+    utc_now = datetime.utcnow()
+    ist_now = utc_now + timedelta(hours=5, minutes=30)
+    return ist_now.date()
+
+
+@st.cache_resource
+def get_storage():
+    return get_backend()
+
+
+@st.cache_resource
+def get_budget_store():
+    return BudgetStore(get_storage().data_dir)
+
+
+@st.cache_resource
+def get_recurring_store():
+    return RecurringStore(get_storage().data_dir)
+
+
+def current_month():
+    return get_ist_date().strftime('%Y-%m')
+
+
+def init_state():
+    if 'pending' not in st.session_state:
+        st.session_state.pending = PendingWrites(get_storage())
+        st.session_state.editor_versions = {table: 0 for table in TABLES}
+        st.session_state.data_versions = {}
+        st.session_state.base_versions = {}
+        # table -> SearchIndex, built on a table's first search
+        st.session_state.search_indexes = {}
+        # table -> the `since` its frame was loaded with; None is the backend's hot window
+        st.session_state.windows = {}
+        # A new session is the app starting up for someone: write whatever recurring rules fell due meanwhile
+        added = run_recurring()
+        if added:
+            st.toast("Added recurring " + " and ".join(f"{table} ({n:,})" for table, n in added.items()), icon="🔁")
+    # Tables already refreshed in this rerun
+    st.session_state.refreshed = set()
+
+
+def load_table(table, since=None):
+    # Frames are shared read-only across sessions; a session keeps its own copy only while it has unsaved edits.
+    # since asks for history back to that date (or ALL_HISTORY); a session's window only ever grows.
+    storage = get_storage()
+    window = st.session_state.windows.get(table)
+    if since is not None and storage.window_start(since) < storage.window_start(window):
+        if st.session_state.pending.has(table):
+            # Unsaved edits live only in our frame, so write them before it is replaced by the wider one
+            st.session_state.pending.flush(force=True)
+        window = st.session_state.windows[table] = since
+        st.session_state.refreshed.discard(table)
+    if table not in st.session_state.refreshed:
+        st.session_state.refreshed.add(table)
+        if not st.session_state.pending.has(table):
+            try:
+                df, version = storage.shared(table, window)
+            except StorageError as e:
+                st.error(f"⚠️ {e}. Fix or restore the file and reload; nothing has been overwritten.")
+                st.stop()
+            st.session_state.base_versions[table] = version
+            if st.session_state.get(table) is not df:
+                if table in st.session_state and version != st.session_state.pending.versions.get(table):
+                    # Another session wrote since we last looked (a windowed table re-reads even after our own write)
+                    st.session_state.totals_stale = True
+                st.session_state[table] = df
+                st.session_state.data_versions[table] = version
+    return st.session_state[table]
+
+
+def loaded_from(table):
+    # First month (YYYY-MM) of the session's frame for table
+    return get_storage().window_start(st.session_state.windows.get(table))
+
+
+def mark_changed(table, old_rows=None, new_rows=None):
+    # Called after each change a session makes to its own frame. With the touched rows before/after,
+    # an up-to-date search index follows the change; otherwise it is rebuilt on the next search.
+    version = next_version()
+    index = st.session_state.search_indexes.get(table)
+    if index is not None and index.version == st.session_state.data_versions.get(table) and (old_rows is not None or new_rows is not None):
+        index.replace(old_rows, new_rows)
+        index.version = version
+    st.session_state.data_versions[table] = version
+
+
+def search_index(table):
+    # Index of the session's current frame for table
+    index = st.session_state.search_indexes.get(table)
+    if index is None or index.version != st.session_state.data_versions[table]:
+        with profiling.span(f"index {table}"):
+            index = SearchIndex.build(st.session_state[table], SEARCH_COLUMNS[table])
+        index.version = st.session_state.data_versions[table]
+        st.session_state.search_indexes[table] = index
+    return index
+
+
+def get_categories():
+    # Worked out once per version of the session's expenses rather than on every rerun
+    df = load_table("expenses")
+    version = st.session_state.data_versions["expenses"]
+    cached = st.session_state.get('categories')
+    if cached and cached[0] == version:
+        return list(cached[1])
+    with profiling.span("categories"):
+        combined_categories = list(set(DEFAULT_CATEGORIES + get_storage().categories(df)))
+        if "Other" in combined_categories:
+            combined_categories.remove("Other")
+        combined_categories.sort()
+        combined_categories.append("Other")
+    st.session_state.categories = (version, combined_categories)
+    return list(combined_categories)
+
+
+def get_totals():
+    # All-time totals. The storage answers them from whatever it has (frames, indexes or partition
+    # summaries), which may not include our own unsaved edits yet.
+    storage = get_storage()
+    df_expenses, df_funds = load_table("expenses"), load_table("funds")
+    pending = st.session_state.pending
+    with profiling.span("totals"):
+        if 'totals' not in st.session_state or st.session_state.get('totals_stale'):
+            if pending.has("expenses") or pending.has("funds"):
+                pending.flush(force=True)
+            st.session_state.totals = LedgerTotals.from_storage(storage, df_expenses, df_funds)
+            st.session_state.totals_stale = False
+        elif not (pending.has("expenses") or pending.has("funds")):
+            st.session_state.totals = st.session_state.totals.verify(df_expenses, df_funds, storage=storage)
+    return st.session_state.totals
+
+
+def budget_alerts():
+    # Budget thresholds crossed since the last rerun. Only the (month, category) pairs the session's own
+    # changes touched are checked; after a rebuild of the totals, this month's categories are.
+    totals = get_totals()
+    store = get_budget_store()
+    touched = totals.take_touched()
+    signature = file_signature(store.path)
+    if touched is None or st.session_state.get('budgets_signature') != signature:
+        # Budgets changed (here or in another session), so this month is checked against the new limits
+        st.session_state.budgets_signature = signature
+        month = current_month()
+        touched = (touched or set()) | {(month, category) for category in totals.spent_by_month.get(month, {})}
+    if not any(category in store.load().limits for _, category in touched):
+        return []
+    with profiling.span("budgets"):
+        return store.record_alerts(totals.spent_by_month, touched)
+
+
+def run_recurring():
+    # Catch-up pass of the recurring rules (kharch.recurring); returns table -> rows added
+    store = get_recurring_store()
+    today = get_ist_date()
+    if not store.is_due(today):
+        return {}
+    # Our unsaved rows go first, so the appended occurrences never race the write-behind thread
+    st.session_state.pending.flush(force=True)
+    try:
+        with profiling.span("recurring"):
+            return store.catch_up(get_storage(), today).added
+    except (StorageError, OSError) as e:
+        st.warning(f"Recurring entries not added yet ({e}); they stay due and are retried on the next start.")
+        return {}
+
+
+# --- Table Edits ---
+def editor_key(table):
+    return f"{table}_editor_{st.session_state.editor_versions[table]}"
+
+
+def on_editor_change(table, ids=None):
+    # Apply only the cells/rows the user touched; st.session_state.pending writes them in the background
+    df, old_rows, new_rows = apply_editor_changes(st.session_state[table], st.session_state[editor_key(table)], TABLES[table][1], ids)
+    st.session_state[table] = df
+    mark_changed(table, old_rows, new_rows)
+    # Totals not built yet in this session are built once these edits are saved
+    if table == "expenses" and 'totals' in st.session_state:
+        st.session_state.totals.replace_expenses(old_rows, new_rows)
+    elif table == "funds" and 'totals' in st.session_state:
+        st.session_state.totals.replace_funds(old_rows, new_rows)
+    st.session_state.pending.add(table, df, st.session_state.base_versions.get(table), new_rows.index, old_rows.index.difference(new_rows.index))
+    # A fresh key gives the editor a clean delta against the updated frame
+    st.session_state.editor_versions[table] += 1
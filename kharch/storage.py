@@ -0,0 +1,1046 @@
+import copy
+import functools
+import io
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import closing, contextmanager
+
+import numpy as np
+import pandas as pd
+
+from kharch import profiling
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks on Windows; writes are still atomic renames
+    fcntl = None
+
+EXPENSES_FILE = 'expenses.csv'
+FUNDS_FILE = 'funds.csv'
+TODO_FILE = 'todo.csv'
+DB_FILE = 'kharch.db'
+JOURNAL_SUFFIX = '.journal'
+LOCK_SUFFIX = '.lock'
+JOURNAL_COMPACT_BYTES = 256 * 1024
+JOURNAL_ROW_BYTES = 48
+SUMMARY_FILE = 'summary.json'
+# Bumped when summarize() changes, so summaries written before are worked out again (2: blank modes)
+SUMMARY_VERSION = 2
+# Row ids are stored in the files, so they stay put when other rows are deleted
+ID_COLUMN = 'id'
+HOT_MONTHS = 1
+# shared(table, since=ALL_HISTORY) asks for every month; UNDATED is the partition for rows without a date
+ALL_HISTORY = 'all'
+UNDATED = '0000-00'
+# Per-month totals by Mode count rows without one under this key, so the ledger can post them to its
+# default account instead of losing them; rows without a Category are left out of category totals
+BLANK_MODE = ''
+
+EXPENSE_COLUMNS = ["Date", "Item", "Category", "Amount", "Mode"]
+FUNDS_COLUMNS = ["Date", "Source", "Mode", "Amount"]
+TODO_COLUMNS = ["Item", "Notes", "Done"]
+
+TABLES = {
+    "expenses": (EXPENSES_FILE, EXPENSE_COLUMNS),
+    "funds": (FUNDS_FILE, FUNDS_COLUMNS),
+    "todo": (TODO_FILE, TODO_COLUMNS),
+}
+
+SQL_TYPES = {"Date": "TEXT", "Amount": "REAL", "Done": "INTEGER"}
+SQL_PAISE = "CAST(ROUND(SUM(Amount) * 100) AS INTEGER)"
+# Column tuples to index. Date leads for range queries, and the rest covers the per-day totals
+# (SQLiteBackend._day_totals) so they are read from the index alone.
+SQL_INDEXES = {
+    "expenses": [("Date", "Category", "Mode", "Amount")],
+    "funds": [("Date", "Mode", "Amount")],
+    "todo": [],
+}
+
+
+class StorageError(Exception):
+    pass
+
+
+class ConflictError(StorageError):
+    # The table changed on disk after the caller's frame was read
+    pass
+
+
+_versions = itertools.count(1)
+
+def next_version():
+    # Process-wide, so a version number never means two different datasets
+    return next(_versions)
+
+
+# --- CSV files ---
+def journal_path(file_path):
+    return file_path + JOURNAL_SUFFIX
+
+# In memory every table uses one compact schema: datetime64 Date, categorical Category/Mode and
+# Amount as nullable integer paise ("Int64"). Files and the database keep plain rupees.
+CATEGORICAL_COLUMNS = ["Category", "Mode"]
+
+def to_paise(amounts):
+    return (pd.to_numeric(amounts, errors='coerce') * 100).round().astype('Int64')
+
+def to_rupees(paise):
+    return paise.astype('float64') / 100
+
+def enforce_schema(df):
+    # Idempotent: an Int64 Amount is already paise, any other dtype is read as rupees
+    changes = {}
+    if 'Date' in df.columns and not pd.api.types.is_datetime64_dtype(df['Date']):
+        changes['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    if 'Amount' in df.columns and df['Amount'].dtype != 'Int64':
+        changes['Amount'] = to_paise(df['Amount'])
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            changes[col] = df[col].astype('category')
+    return df.assign(**changes) if changes else df
+
+def to_disk(df):
+    changes = {}
+    if 'Amount' in df.columns and df['Amount'].dtype == 'Int64':
+        changes['Amount'] = to_rupees(df['Amount'])
+    if 'Date' in df.columns and pd.api.types.is_datetime64_dtype(df['Date']):
+        # numpy formats whole days in C; to_csv's date_format runs strftime row by row
+        days = df['Date'].to_numpy().astype('datetime64[D]').astype(str)
+        changes['Date'] = np.where(df['Date'].isna().to_numpy(), '', days)
+    return df.assign(**changes) if changes else df
+
+def empty_frame(columns):
+    df = pd.DataFrame(columns=columns)
+    if "Done" in columns:
+        df["Done"] = df["Done"].astype(bool)
+    return enforce_schema(df)
+
+def normalize_frame(df, columns):
+    for col in columns:
+        if col not in df.columns:
+            if col == "Done":
+                df[col] = False
+            elif col == "Mode":
+                df[col] = "Online"
+            else:
+                df[col] = ""
+    if "Done" in df.columns:
+        df["Done"] = df["Done"].astype(str).str.lower().isin(['true', '1', 'yes', 't'])
+    return enforce_schema(df)
+
+def _complete_length(path):
+    # Bytes up to and including the last newline; anything after it is a line an interrupted append left unfinished
+    with open(path, 'rb') as fh:
+        end = fh.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 4096)
+            fh.seek(start)
+            at = fh.read(end - start).rfind(b'\n')
+            if at >= 0:
+                return start + at + 1
+            end = start
+    return 0
+
+def _drop_torn_tail(path):
+    # Cuts an unfinished last line off a file about to be appended to, so new rows start on a line of their
+    # own; returns whether the file still needs its header
+    if not os.path.exists(path):
+        return True
+    length = _complete_length(path)
+    if length < os.path.getsize(path):
+        os.truncate(path, length)
+    return length == 0
+
+def _read_csv(path, columns, appended=False, usecols=None):
+    # appended marks files written by appends (journals, partitions), which may end in a torn line
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    try:
+        source = path
+        if appended:
+            length = _complete_length(path)
+            if length < os.path.getsize(path):
+                with open(path, 'rb') as fh:
+                    source = io.BytesIO(fh.read(length))
+        df = pd.read_csv(source, usecols=usecols)
+    except pd.errors.EmptyDataError:
+        return pd.DataFrame(columns=columns)
+    except Exception as e:
+        # Never hand back an empty book for a file we could not read; the next save would wipe it
+        raise StorageError(f"Could not read {path}: {e}") from e
+    profiling.count_read(os.path.getsize(path))
+    return df
+
+def load_csv(file_path, columns):
+    log_path = journal_path(file_path)
+    if not (os.path.exists(file_path) or os.path.exists(log_path)):
+        return empty_frame(columns)
+    df = _read_csv(file_path, columns)
+    # Replay the append-only journal: rows were written oldest-first, the book shows newest-first
+    if os.path.exists(log_path):
+        df_log = _read_csv(log_path, columns, appended=True)
+        if ID_COLUMN in df_log.columns and ID_COLUMN in df.columns:
+            # save_csv replaces the file before removing the journal; a crash in between leaves rows in both
+            df_log = df_log[~df_log[ID_COLUMN].isin(df[ID_COLUMN])]
+        df = pd.concat([df_log.iloc[::-1], df], ignore_index=True)
+    if ID_COLUMN in df.columns:
+        df = df.set_index(ID_COLUMN).rename_axis(None)
+        df.index = df.index.astype('int64')
+    else:
+        # Files written before ids were stored (see CSVBackend._store_ids): ids count up from the oldest row
+        df.index = pd.RangeIndex(len(df) - 1, -1, -1)
+    return normalize_frame(df, columns)
+
+def has_ids(file_path):
+    # Whether the table's files store row ids; a table with no files yet will be written with them
+    for path in (file_path, journal_path(file_path)):
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, newline='') as fh:
+                return fh.readline().split(',', 1)[0].strip() == ID_COLUMN
+    return True
+
+def last_id(file_path):
+    # Highest row id on disk without loading the rows; -1 for an empty table. Journaled rows are numbered after
+    # the file's, so a journal newer than the file settles it. Otherwise (no journal yet, or one a crash left
+    # behind after a compaction) the file's id column is read on its own.
+    log_path = journal_path(file_path)
+    log_stamp, file_stamp = file_signature(log_path), file_signature(file_path)
+
+    def newest(path, appended):
+        ids = _read_csv(path, [ID_COLUMN], appended, usecols=[ID_COLUMN])[ID_COLUMN]
+        return int(ids.max()) if len(ids) else -1
+
+    if log_stamp and (file_stamp is None or log_stamp[0] > file_stamp[0]):
+        found = newest(log_path, True)
+        if found >= 0:
+            return found
+    return max(newest(file_path, False) if file_stamp else -1, newest(log_path, True) if log_stamp else -1)
+
+def with_id_column(df):
+    # The frame as it is written to a file: row ids in a leading id column
+    return df.rename_axis(ID_COLUMN).reset_index()
+
+@contextmanager
+def file_lock(lock_path):
+    with open(lock_path, 'a') as fh:
+        if fcntl:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+def _fsync_dir(path):
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _atomic_write(file_path, write):
+    # Temp file + fsync + rename: readers see the old file or the new one, never a truncated one
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        # mkstemp creates the file 0600; keep the permissions the book already had
+        os.chmod(tmp_path, os.stat(file_path).st_mode if os.path.exists(file_path) else 0o666 & ~_umask())
+        with os.fdopen(fd, 'w', newline='') as fh:
+            write(fh)
+            profiling.count_written(fh.tell())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def save_csv(df, file_path):
+    _atomic_write(file_path, lambda fh: with_id_column(to_disk(df)).to_csv(fh, index=False, date_format='%Y-%m-%d'))
+    # A full rewrite already contains every journaled row
+    log_path = journal_path(file_path)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    _fsync_dir(file_path)
+
+def save_json(obj, file_path):
+    _atomic_write(file_path, lambda fh: json.dump(obj, fh))
+    _fsync_dir(file_path)
+
+def append_csv(new_rows, df, file_path, columns=None):
+    # new_rows are prepended in memory, so journal them reversed to keep the on-screen order after a replay.
+    # df is the full table for compaction; pass None when it may be stale and the files are re-read instead.
+    log_path = journal_path(file_path)
+    if df is not None and len(new_rows) * JOURNAL_ROW_BYTES >= JOURNAL_COMPACT_BYTES:
+        # A bulk batch would be compacted straight away; write the table once instead of twice
+        save_csv(df, file_path)
+        return
+    new_log = _drop_torn_tail(log_path)
+    with open(log_path, 'a', newline='') as fh:
+        start = fh.tell()
+        with_id_column(to_disk(new_rows.iloc[::-1])).to_csv(fh, header=new_log, index=False, date_format='%Y-%m-%d')
+        profiling.count_written(fh.tell() - start)
+        fh.flush()
+        os.fsync(fh.fileno())
+    if os.path.getsize(log_path) >= JOURNAL_COMPACT_BYTES:
+        save_csv(df if df is not None else load_csv(file_path, columns or list(new_rows.columns)), file_path)
+
+
+def concat_rows(new_rows, df):
+    # Prepend new_rows to df keeping the schema; categoricals only concat cleanly with equal categories
+    new_rows = enforce_schema(new_rows)
+    if df.empty:
+        return new_rows
+    df = enforce_schema(df)
+    new_cols, old_cols = {}, {}
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and col in new_rows.columns:
+            cats = df[col].cat.categories.union(new_rows[col].cat.categories)
+            if not cats.equals(df[col].cat.categories):
+                old_cols[col] = df[col].cat.set_categories(cats)
+            if not cats.equals(new_rows[col].cat.categories):
+                new_cols[col] = new_rows[col].cat.set_categories(cats)
+    return pd.concat([new_rows.assign(**new_cols), df.assign(**old_cols)])
+
+def with_new_ids(new_rows, df):
+    # Newest rows go on top, so the first new row gets the highest fresh id
+    return with_ids_from(new_rows, int(df.index.max()) + 1 if len(df) else 0)
+
+def with_ids_from(new_rows, start):
+    return new_rows.set_axis(pd.RangeIndex(start + len(new_rows) - 1, start - 1, -1))
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class JsonFile:
+    # A small JSON document kept with the book (budgets, recurring rules): re-read only when the file
+    # changes and written atomically. A read-change-write must hold lock() around all of it.
+
+    def __init__(self, path, default):
+        self.path = path
+        self.default = default
+        self._cached = (None, None)
+
+    def lock(self):
+        return file_lock(self.path + LOCK_SUFFIX)
+
+    def load(self):
+        # A copy the caller may change freely
+        signature = file_signature(self.path)
+        if signature is None:
+            return copy.deepcopy(self.default)
+        if self._cached[0] != signature:
+            with open(self.path) as fh:
+                self._cached = (signature, json.load(fh))
+            profiling.count_read(signature[1])
+        return copy.deepcopy(self._cached[1])
+
+    def save(self, obj):
+        save_json(obj, self.path)
+
+
+# --- Backends ---
+class CSVBackend:
+    name = "csv"
+    single_file = False
+    # Tables whose shared frames only hold the months a caller asks for (see window_start and _load_window)
+    windowed_tables = []
+
+    def __init__(self, data_dir="."):
+        self.data_dir = data_dir
+        # One parsed frame per table shared by every session of this process: table -> (signature, version, df).
+        # Shared frames are read-only; writers build a new frame and publish it.
+        self._shared = {}
+        self._shared_lock = threading.Lock()
+        # table -> (frame, row positions in date order, sorted dates) for month_rows
+        self._date_orders = {}
+        for table in self.csv_tables():
+            self._store_ids(table)
+
+    def csv_tables(self):
+        # Tables this backend keeps in CSV files of the load_csv/save_csv layout
+        return list(TABLES)
+
+    def _store_ids(self, table):
+        # One-off migration of a book written before row ids were stored: they are numbered from file
+        # position once, exactly as they were loaded until now, and written out with the rows
+        path = self.path(table)
+        if has_ids(path):
+            return
+        with self.lock(table):
+            if not has_ids(path):
+                save_csv(load_csv(path, TABLES[table][1]), path)
+
+    def path(self, table):
+        return os.path.join(self.data_dir, TABLES[table][0])
+
+    def lock(self, table):
+        return file_lock(self.path(table) + LOCK_SUFFIX)
+
+    def signature(self, table):
+        path = self.path(table)
+        return (file_signature(path), file_signature(journal_path(path)))
+
+    def load(self, table):
+        return load_csv(self.path(table), TABLES[table][1])
+
+    def window_start(self, since=None):
+        # First month (YYYY-MM) a frame from shared(table, since) covers; without windowed tables it is always whole
+        if not self.windowed_tables or since == ALL_HISTORY:
+            return UNDATED
+        if since is None:
+            return (pd.Timestamp.today().to_period('M') - (HOT_MONTHS - 1)).strftime('%Y-%m')
+        return pd.Timestamp(since).strftime('%Y-%m')
+
+    def shared(self, table, since=None):
+        # Returns (df, version), re-reading the table only when the files changed under us
+        if table in self.windowed_tables:
+            return self._shared_window(table, self.window_start(since))
+        signature = self.signature(table)
+        with self._shared_lock:
+            hit = self._shared.get(table)
+        if hit and hit[0] == signature:
+            return hit[2], hit[1]
+        with profiling.span(f"load {table}"):
+            df = self.load(table)
+        version = next_version()
+        with self._shared_lock:
+            self._shared[table] = (signature, version, df)
+        return df, version
+
+    def _shared_window(self, table, start):
+        # A windowed table shares {window start: df} under one version
+        signature = self.signature(table)
+        with self._shared_lock:
+            hit = self._shared.get(table)
+            if hit and hit[0] == signature and start in hit[2]:
+                return hit[2][start], hit[1]
+        with profiling.span(f"load {table}"):
+            df = self._load_window(table, start)
+        with self._shared_lock:
+            hit = self._shared.get(table)
+            if hit and hit[0] == signature:
+                hit[2][start] = df
+                return df, hit[1]
+            version = next_version()
+            self._shared[table] = (signature, version, {start: df})
+        return df, version
+
+    def invalidate(self, table):
+        with self._shared_lock:
+            self._shared.pop(table, None)
+
+    def is_current(self, table, base_version):
+        # base_version is the shared version the caller's frame was derived from; None skips the check
+        if base_version is None:
+            return True
+        with self._shared_lock:
+            hit = self._shared.get(table)
+        return bool(hit) and hit[1] == base_version and hit[0] == self.signature(table)
+
+    def publish(self, table, df, before=None):
+        version = next_version()
+        signature = self.signature(table)
+        with self._shared_lock:
+            if self.single_file:
+                # Every table shares one file, so the other tables' frames are still current
+                for other, (sig, other_version, other_df) in list(self._shared.items()):
+                    if sig == before:
+                        self._shared[other] = (signature, other_version, other_df)
+            # The writer's frame covers an unknown window, so each window is rebuilt on demand
+            self._shared[table] = (signature, version, {} if table in self.windowed_tables else df)
+        return version
+
+    # Writes hold the table's advisory lock and return the new shared version of df.
+    # save/apply_changes raise ConflictError when base_version is stale; append merges instead.
+    def save(self, table, df, base_version=None):
+        with profiling.span(f"save {table}"), self.lock(table):
+            if not self.is_current(table, base_version):
+                raise ConflictError(f"{table} changed since it was loaded")
+            before = self.signature(table)
+            self._save(table, df)
+            return self.publish(table, df, before)
+
+    def append(self, table, new_rows, df, base_version=None):
+        with profiling.span(f"append {table}"), self.lock(table):
+            before = self.signature(table)
+            if self.is_current(table, base_version):
+                self._append(table, new_rows, df)
+                return self.publish(table, df, before)
+            # New rows commute with whatever was written meanwhile: store them and let every session re-read
+            self._append(table, new_rows, None)
+            self.invalidate(table)
+            return None
+
+    def apply_changes(self, table, df, upsert_ids, delete_ids, base_version=None):
+        with profiling.span(f"write {table}"), self.lock(table):
+            if not self.is_current(table, base_version):
+                raise ConflictError(f"{table} changed since it was loaded")
+            before = self.signature(table)
+            self._apply_changes(table, df, upsert_ids, delete_ids)
+            return self.publish(table, df, before)
+
+    def _save(self, table, df):
+        save_csv(df, self.path(table))
+
+    def _append(self, table, new_rows, df):
+        if df is None:
+            # Our ids may be taken meanwhile; number the rows after the newest id on disk
+            new_rows = with_ids_from(new_rows, last_id(self.path(table)) + 1)
+        append_csv(new_rows, df, self.path(table), TABLES[table][1])
+
+    def _apply_changes(self, table, df, upsert_ids, delete_ids):
+        # A CSV cannot be patched in place, so a batch of row edits becomes one rewrite
+        save_csv(df, self.path(table))
+
+    # Queries take the in-memory frame and answer in paise; the SQLite backend uses its indexes instead
+    def mode_totals(self, table, df):
+        if df.empty or 'Mode' not in df.columns:
+            return {}
+        return {mode: int(total) for mode, total in df.groupby('Mode', observed=True)['Amount'].sum().items()}
+
+    def month_totals(self, table, column, df):
+        # {YYYY-MM: {value of column: paise}}, column being Mode or Category
+        return totals_by_month(df, column)
+
+    def month_rows(self, table, month, df):
+        # The rows of table dated in month (YYYY-MM), found by bisecting df's dates in sorted order
+        order, dates = self._date_order(table, df)
+        start = pd.Timestamp(month)
+        bounds = np.array([start, start + pd.offsets.MonthBegin()], dtype=dates.dtype)
+        lo, hi = np.searchsorted(dates, bounds)
+        return df.iloc[np.sort(order[lo:hi])]
+
+    def _date_order(self, table, df):
+        # Positions of df's rows in date order (NaT last) and the sorted dates, computed once per frame;
+        # frames are never modified in place, so the frame object identifies them
+        hit = self._date_orders.get(table)
+        if hit is None or hit[0] is not df:
+            dates = df['Date'].to_numpy()
+            order = np.argsort(dates, kind='stable')
+            hit = self._date_orders[table] = (df, order, dates[order])
+        return hit[1], hit[2]
+
+    def total(self, table, df):
+        return int(df['Amount'].sum())
+
+    def categories(self, df):
+        if 'Category' not in df.columns:
+            return []
+        return [str(x) for x in df['Category'].dropna().unique().tolist()]
+
+    def daily_totals(self, df):
+        return df.groupby("Date")["Amount"].sum().reset_index().sort_values("Date")
+
+
+class SQLiteBackend(CSVBackend):
+    # One database file. Expenses and funds are shared in windows of recent months like the monthly
+    # backend's, and the all-time figures are answered from per-day totals kept until the file changes.
+    name = "sqlite"
+    single_file = True
+    windowed_tables = ["expenses", "funds"]
+
+    def csv_tables(self):
+        return []
+
+    def __init__(self, data_dir=".", db_file=DB_FILE):
+        super().__init__(data_dir)
+        self.db_path = os.path.join(data_dir, db_file)
+        # table -> (database signature, per-day totals)
+        self._day_cache = {}
+        fresh = not os.path.exists(self.db_path)
+        self._create_schema()
+        if fresh:
+            migrate_csv(CSVBackend(data_dir), self)
+
+    def connect(self):
+        return closing(sqlite3.connect(self.db_path))
+
+    def signature(self, table):
+        return file_signature(self.db_path)
+
+    def lock(self, table):
+        # Versions are per database file, so one lock covers every table
+        return file_lock(self.db_path + LOCK_SUFFIX)
+
+    def _create_schema(self):
+        with self.connect() as conn, conn:
+            for table, (_, columns) in TABLES.items():
+                cols = ", ".join(f'"{c}" {SQL_TYPES.get(c, "TEXT")}' for c in columns)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})')
+                for index_cols in SQL_INDEXES[table]:
+                    name = "_".join(index_cols).lower()
+                    quoted = ", ".join(f'"{c}"' for c in index_cols)
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{name} ON {table} ({quoted})')
+
+    def _records(self, table, df, with_ids=True):
+        columns = TABLES[table][1]
+        rows = to_disk(df.reindex(columns=columns).iloc[::-1])
+        if with_ids:
+            rows.insert(0, 'id', rows.index.astype(int))
+            columns = ['id'] + columns
+        if 'Date' in rows.columns:
+            rows = rows.assign(Date=pd.to_datetime(rows['Date'], errors='coerce').dt.strftime('%Y-%m-%d'))
+        if 'Done' in rows.columns:
+            rows = rows.assign(Done=rows['Done'].fillna(False).astype(bool).astype(int))
+        nbytes = int(rows.memory_usage(deep=True, index=False).sum())
+        rows = rows.astype(object).where(rows.notna(), None)
+        return columns, list(rows.itertuples(index=False, name=None)), nbytes
+
+    def _insert(self, conn, table, df, verb='INSERT', with_ids=True):
+        columns, records, nbytes = self._records(table, df, with_ids)
+        profiling.count_written(nbytes)
+        cols = ", ".join(f'"{c}"' for c in columns)
+        marks = ", ".join("?" for _ in columns)
+        conn.executemany(f'{verb} INTO {table} ({cols}) VALUES ({marks})', records)
+
+    def _read_sql(self, sql, params=(), index_col=None):
+        # Rows arrive through sqlite3 rather than a file read, so the bytes counted are those of the rows fetched
+        with self.connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params, index_col=index_col)
+        profiling.count_read(int(df.memory_usage(deep=True).sum()))
+        return df
+
+    def load(self, table):
+        columns = TABLES[table][1]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        # Highest id is the newest row, matching the newest-first order of the CSV files
+        df = self._read_sql(f'SELECT id, {cols} FROM {table} ORDER BY id DESC', index_col='id')
+        df.index.name = None
+        return normalize_frame(df, columns)
+
+    def _load_window(self, table, start):
+        # Rows dated from start on, plus any older row with a newer id than those (a backdated entry), so the
+        # newest id is always loaded; both halves of the OR are answered from an index
+        if start == UNDATED:
+            return self.load(table)
+        columns = TABLES[table][1]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        first_day = f"{start}-01"
+        cutoff = f'COALESCE((SELECT MIN(id) FROM {table} WHERE Date >= :day), (SELECT MAX(id) FROM {table}), 0)'
+        df = self._read_sql(f'SELECT id, {cols} FROM {table} WHERE Date >= :day OR id >= {cutoff} ORDER BY id DESC',
+                            {"day": first_day}, index_col='id')
+        df.index.name = None
+        return normalize_frame(df, columns)
+
+    def _save(self, table, df):
+        with self.connect() as conn, conn:
+            conn.execute(f'DELETE FROM {table}')
+            self._insert(conn, table, df)
+
+    def _append(self, table, new_rows, df):
+        with self.connect() as conn, conn:
+            # Without a current frame (df is None) our ids may already be taken, so let SQLite number the rows
+            self._insert(conn, table, new_rows, with_ids=df is not None)
+
+    def _apply_changes(self, table, df, upsert_ids, delete_ids):
+        with self.connect() as conn, conn:
+            conn.executemany(f'DELETE FROM {table} WHERE id = ?', [(int(i),) for i in delete_ids])
+            # A delete writes no row values; count the ids it sends
+            profiling.count_written(8 * len(delete_ids))
+            upserts = [i for i in upsert_ids if i in df.index]
+            if upserts:
+                self._insert(conn, table, df.loc[upserts], verb='INSERT OR REPLACE')
+
+    def _day_totals(self, table):
+        # Paise per (Date, Category, Mode) from one scan of the covering index, kept until the database file
+        # changes; every total below is a small group-by over it
+        signature = file_signature(self.db_path)
+        hit = self._day_cache.get(table)
+        if hit and hit[0] == signature:
+            return hit[1]
+        keys = [c for c in ["Date", "Category", "Mode"] if c in TABLES[table][1]]
+        cols = ", ".join(keys)
+        days = self._read_sql(f'SELECT {cols}, {SQL_PAISE} AS Amount FROM {table} GROUP BY {cols}')
+        dated = days["Date"].fillna('').astype(str)
+        days["month"] = np.where(dated == '', UNDATED, dated.str[:7])
+        self._day_cache[table] = (signature, days)
+        return days
+
+    def mode_totals(self, table, df):
+        return {mode: int(total) for mode, total in self._day_totals(table).groupby("Mode")["Amount"].sum().items()}
+
+    def month_totals(self, table, column, df):
+        sums = self._day_totals(table).groupby(["month", column], dropna=False)["Amount"].sum()
+        out = {}
+        for (month, value), total in sums.items():
+            key = total_key(column, value)
+            if key is not None:
+                by_value = out.setdefault(month, {})
+                by_value[key] = by_value.get(key, 0) + int(total)
+        return out
+
+    def month_rows(self, table, month, df):
+        # Uses the Date index; rows are read back newest first like load()
+        start = pd.Timestamp(month)
+        columns = TABLES[table][1]
+        cols = ", ".join(f'"{c}"' for c in columns)
+        bounds = (start.strftime('%Y-%m-%d'), (start + pd.offsets.MonthBegin()).strftime('%Y-%m-%d'))
+        df = self._read_sql(f'SELECT id, {cols} FROM {table} WHERE Date >= ? AND Date < ? ORDER BY id DESC', bounds, index_col='id')
+        df.index.name = None
+        return normalize_frame(df, columns)
+
+    def total(self, table, df):
+        return int(self._day_totals(table)["Amount"].sum())
+
+    def categories(self, df):
+        return [str(c) for c in self._day_totals("expenses")["Category"].dropna().unique()]
+
+    def daily_totals(self, df):
+        days = self._day_totals("expenses")
+        daily = days[days["month"] != UNDATED].groupby("Date", as_index=False)["Amount"].sum()
+        daily["Date"] = pd.to_datetime(daily["Date"])
+        return daily
+
+
+def month_keys(dates):
+    # YYYY-MM per date (UNDATED for missing ones), formatted by numpy rather than strftime per row
+    dates = pd.to_datetime(dates, errors='coerce')
+    return pd.Series(np.where(dates.isna().to_numpy(), UNDATED, dates.to_numpy().astype('datetime64[M]').astype(str)), index=dates.index)
+
+def total_key(column, value):
+    # Key of value in per-month totals, None to leave the row out (see BLANK_MODE)
+    if pd.isna(value):
+        return BLANK_MODE if column == "Mode" else None
+    return str(value)
+
+def totals_by_month(df, column):
+    # {YYYY-MM: {value of column: paise}}; rows are grouped on numpy months and only the group keys are formatted
+    if df.empty or column not in df.columns:
+        return {}
+    months = df['Date'].to_numpy().astype('datetime64[M]')
+    sums = df['Amount'].groupby([months, df[column]], observed=True, dropna=False).sum()
+    out = {}
+    for (month, value), total in sums.items():
+        key = total_key(column, value)
+        if key is None:
+            continue
+        by_value = out.setdefault(UNDATED if pd.isna(month) else pd.Timestamp(month).strftime('%Y-%m'), {})
+        by_value[key] = by_value.get(key, 0) + int(total)
+    return out
+
+def _concat_partitions(frames, columns):
+    # Partitions are read separately, so their categoricals only agree after a union
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return empty_frame(columns)
+    changes = [{} for _ in frames]
+    for col in CATEGORICAL_COLUMNS:
+        if col in columns:
+            cats = functools.reduce(lambda a, b: a.union(b), (f[col].cat.categories for f in frames))
+            for change, f in zip(changes, frames):
+                if not f[col].cat.categories.equals(cats):
+                    change[col] = f[col].cat.set_categories(cats)
+    return pd.concat([f.assign(**change) for f, change in zip(frames, changes)])
+
+# Column -> the per-month breakdown of it kept in each partition summary
+SUMMARY_KEYS = {"Mode": "modes", "Category": "categories", "Date": "days"}
+
+def summarize(df, months=None):
+    # What the totals need from each month, so all-time figures never read old rows: {month: summary}.
+    # months defaults to each row's own month; the stored partition signature is filled in by the caller.
+    months = month_keys(df['Date']).to_numpy() if months is None else months
+    base = pd.DataFrame({"month": months, "id": df.index.to_numpy(), "amount": df['Amount'].fillna(0).astype('int64').to_numpy()})
+    stats = base.groupby("month").agg(rows=("id", "size"), min_id=("id", "min"), max_id=("id", "max"), total=("amount", "sum"))
+    out = {
+        month: {"signature": None, "rows": int(r.rows), "min_id": int(r.min_id), "max_id": int(r.max_id), "total": int(r.total)}
+        for month, r in stats.iterrows()
+    }
+    for col, key in SUMMARY_KEYS.items():
+        if col not in df.columns:
+            continue
+        for summary in out.values():
+            summary[key] = {}
+        sums = base.assign(key=df[col].values).groupby(["month", "key"], observed=True, dropna=False)["amount"].sum()
+        for (month, k), v in sums.items():
+            k = (None if pd.isna(k) else k.strftime('%Y-%m-%d')) if col == "Date" else total_key(col, k)
+            if k is not None:
+                out[month][key][k] = out[month][key].get(k, 0) + int(v)
+    return out
+
+def _partition_summary(df, month, signature):
+    summary = summarize(df, np.full(len(df), month)).get(month) or {"rows": 0, "min_id": None, "max_id": None, "total": 0}
+    summary["signature"] = list(signature) if signature else None
+    return summary
+
+def _merge_summaries(a, b):
+    merged = dict(a, signature=b["signature"], rows=a["rows"] + b["rows"], total=a["total"] + b["total"])
+    for key, pick in [("min_id", min), ("max_id", max)]:
+        values = [x for x in (a[key], b[key]) if x is not None]
+        merged[key] = pick(values) if values else None
+    for key in ["modes", "categories", "days"]:
+        if key in b:
+            merged[key] = dict(a.get(key, {}))
+            for k, v in b[key].items():
+                merged[key][k] = merged[key].get(k, 0) + v
+    return merged
+
+
+class PartitionedBackend(CSVBackend):
+    # Expenses and funds are split into one CSV per month (<table>/YYYY-MM.csv, rows keep their id in an
+    # id column) next to a summary.json of per-month totals. shared() loads only the months a caller asks
+    # for, HOT_MONTHS by default, and the totals, categories and daily figures come from the summaries.
+    name = "monthly"
+    partitioned_tables = ["expenses", "funds"]
+    windowed_tables = partitioned_tables
+
+    def __init__(self, data_dir="."):
+        super().__init__(data_dir)
+        # (table, month) -> (signature, df) and table -> (signature, summary); both only ever replaced
+        self._partitions = {}
+        self._summaries = {}
+        fresh = not any(os.path.exists(self._summary_path(t)) for t in self.partitioned_tables)
+        for table in self.partitioned_tables:
+            os.makedirs(self.path(table), exist_ok=True)
+        if fresh:
+            migrate_csv(CSVBackend(data_dir), self)
+
+    def csv_tables(self):
+        return [table for table in TABLES if table not in self.partitioned_tables]
+
+    def path(self, table):
+        if table in self.partitioned_tables:
+            return os.path.join(self.data_dir, table)
+        return super().path(table)
+
+    def _summary_path(self, table):
+        return os.path.join(self.path(table), SUMMARY_FILE)
+
+    def _partition_path(self, table, month):
+        return os.path.join(self.path(table), f"{month}.csv")
+
+    def signature(self, table):
+        # Every write ends by replacing summary.json, so its stamp versions the whole table
+        if table in self.partitioned_tables:
+            return file_signature(self._summary_path(table))
+        return super().signature(table)
+
+    # --- Partitions and summaries ---
+    def _partition(self, table, month):
+        path = self._partition_path(table, month)
+        signature = file_signature(path)
+        hit = self._partitions.get((table, month))
+        if hit and hit[0] == signature:
+            return hit[1]
+        columns = TABLES[table][1]
+        if signature is None:
+            df = empty_frame(columns)
+        else:
+            raw = _read_csv(path, [ID_COLUMN] + columns, appended=True)
+            df = normalize_frame(raw.set_index(ID_COLUMN).rename_axis(None), columns)
+        self._partitions[(table, month)] = (signature, df)
+        return df
+
+    def _summary(self, table):
+        path = self._summary_path(table)
+        signature = file_signature(path)
+        hit = self._summaries.get(table)
+        if hit and hit[0] == signature:
+            return hit[1]
+        summary = {"partitions": {}}
+        if signature is not None:
+            with open(path) as fh:
+                summary = json.load(fh)
+            profiling.count_read(signature[1])
+        if summary.get("version") != SUMMARY_VERSION:
+            # Summarized the old way: every partition is summarized again below
+            for part in summary["partitions"].values():
+                part["signature"] = None
+        # A partition written without its summary (a crash between the two, or a hand edit) is re-summarized
+        parts = summary["partitions"]
+        on_disk = {name[:-4] for name in os.listdir(self.path(table)) if name.endswith('.csv')}
+        for month in on_disk | set(parts):
+            part_signature = file_signature(self._partition_path(table, month))
+            if part_signature is None:
+                parts.pop(month)
+            elif month not in parts or parts[month]["signature"] != list(part_signature):
+                parts[month] = _partition_summary(self._partition(table, month), month, part_signature)
+        self._summaries[table] = (signature, summary)
+        return summary
+
+    def _write_summary(self, table, parts):
+        path = self._summary_path(table)
+        summary = {"version": SUMMARY_VERSION, "partitions": parts}
+        save_json(summary, path)
+        self._summaries[table] = (file_signature(path), summary)
+
+    def _write_partition(self, table, month, df, summary=None):
+        # Returns the month's summary, or None once it has no rows left
+        path = self._partition_path(table, month)
+        if df.empty:
+            if os.path.exists(path):
+                os.remove(path)
+            return None
+        save_csv(df.sort_index(ascending=False), path)
+        signature = file_signature(path)
+        self._partitions[(table, month)] = (signature, df)
+        if summary is None:
+            return _partition_summary(df, month, signature)
+        return dict(summary, signature=list(signature))
+
+    def _load_window(self, table, start):
+        # The months from start on, plus any older row with a newer id than those months hold (a backdated
+        # entry). The newest id is therefore always loaded and with_new_ids() cannot reuse an id on disk.
+        parts = self._summary(table)["partitions"]
+        filled = {m: p for m, p in parts.items() if p["rows"]}
+        if not filled:
+            return empty_frame(TABLES[table][1])
+        newest = max(p["max_id"] for p in filled.values())
+        cutoff = min([p["min_id"] for m, p in filled.items() if m >= start] + [newest])
+        frames = []
+        for month, p in sorted(filled.items(), reverse=True):
+            if month >= start:
+                frames.append(self._partition(table, month))
+            elif p["max_id"] >= cutoff:
+                df = self._partition(table, month)
+                frames.append(df[df.index >= cutoff])
+        return _concat_partitions(frames, TABLES[table][1]).sort_index(ascending=False)
+
+    def load(self, table):
+        if table not in self.partitioned_tables:
+            return super().load(table)
+        return self._load_window(table, UNDATED)
+
+    # --- Writes (called under the table lock) ---
+    def _save(self, table, df):
+        if table not in self.partitioned_tables:
+            return super()._save(table, df)
+        # Replaces the whole table: df must hold every month
+        df = enforce_schema(df)
+        old_months = set(self._summary(table)["partitions"])
+        months = month_keys(df['Date']).to_numpy()
+        summaries = summarize(df, months)
+        parts = {}
+        for month, rows in df.groupby(months) if len(df) else []:
+            parts[month] = self._write_partition(table, month, rows, summaries[month])
+        for month in old_months - set(parts):
+            self._write_partition(table, month, df.iloc[:0])
+        self._write_summary(table, parts)
+
+    def _append(self, table, new_rows, df):
+        if table not in self.partitioned_tables:
+            return super()._append(table, new_rows, df)
+        parts = dict(self._summary(table)["partitions"])
+        if df is None:
+            # Our ids may be taken meanwhile; number the rows after the newest id on disk
+            new_rows = with_ids_from(new_rows, max([p["max_id"] for p in parts.values() if p["rows"]], default=-1) + 1)
+        new_rows = enforce_schema(new_rows)
+        columns = TABLES[table][1]
+        months = month_keys(new_rows['Date']).to_numpy()
+        summaries = summarize(new_rows, months)
+        for month, rows in new_rows.groupby(months):
+            path = self._partition_path(table, month)
+            new_file = _drop_torn_tail(path)
+            with open(path, 'a', newline='') as fh:
+                start = fh.tell()
+                with_id_column(to_disk(rows.reindex(columns=columns))).to_csv(fh, header=new_file, index=False, date_format='%Y-%m-%d')
+                profiling.count_written(fh.tell() - start)
+                fh.flush()
+                os.fsync(fh.fileno())
+            added = dict(summaries[month], signature=list(file_signature(path)))
+            parts[month] = _merge_summaries(parts[month], added) if month in parts else added
+        self._write_summary(table, parts)
+
+    def _apply_changes(self, table, df, upsert_ids, delete_ids):
+        if table not in self.partitioned_tables:
+            return super()._apply_changes(table, df, upsert_ids, delete_ids)
+        # Only the months holding a touched row, before or after the edit, are rewritten
+        parts = dict(self._summary(table)["partitions"])
+        ids = pd.Index(list(upsert_ids) + list(delete_ids))
+        changed = {}
+        for month, p in parts.items():
+            if p["rows"] and ((ids >= p["min_id"]) & (ids <= p["max_id"])).any():
+                part = self._partition(table, month)
+                hit = part.index.intersection(ids)
+                if len(hit):
+                    changed[month] = part.drop(hit)
+        rows = df.loc[df.index.intersection(pd.Index(list(upsert_ids)))]
+        for month, month_rows in rows.groupby(month_keys(rows['Date']).to_numpy()) if len(rows) else []:
+            base = changed[month] if month in changed else self._partition(table, month)
+            changed[month] = concat_rows(month_rows, base)
+        for month, part in changed.items():
+            summary = self._write_partition(table, month, part)
+            if summary is None:
+                parts.pop(month, None)
+            else:
+                parts[month] = summary
+        self._write_summary(table, parts)
+
+    # --- Queries from the summaries: all-time figures without reading old months ---
+    def _summed(self, table, key):
+        totals = {}
+        for p in self._summary(table)["partitions"].values():
+            for k, v in p.get(key, {}).items():
+                totals[k] = totals.get(k, 0) + v
+        return totals
+
+    def mode_totals(self, table, df):
+        if table not in self.partitioned_tables:
+            return super().mode_totals(table, df)
+        return self._summed(table, "modes")
+
+    def month_totals(self, table, column, df):
+        key = SUMMARY_KEYS[column]
+        if table not in self.partitioned_tables:
+            return super().month_totals(table, column, df)
+        return {month: dict(p[key]) for month, p in self._summary(table)["partitions"].items() if p.get(key)}
+
+    def month_rows(self, table, month, df):
+        if table not in self.partitioned_tables:
+            return super().month_rows(table, month, df)
+        return self._partition(table, month)
+
+    def total(self, table, df):
+        if table not in self.partitioned_tables:
+            return super().total(table, df)
+        return sum(p["total"] for p in self._summary(table)["partitions"].values())
+
+    def categories(self, df):
+        return list(self._summed("expenses", "categories"))
+
+    def daily_totals(self, df):
+        totals = self._summed("expenses", "days")
+        daily = pd.DataFrame({"Date": pd.to_datetime(list(totals)), "Amount": list(totals.values())})
+        return daily.sort_values("Date", ignore_index=True)
+
+
+BACKENDS = {"csv": CSVBackend, "sqlite": SQLiteBackend, "monthly": PartitionedBackend}
+
+def get_backend(name=None, data_dir="."):
+    name = (name or os.environ.get("KHARCH_BACKEND", "csv")).lower()
+    return BACKENDS[name](data_dir)
+
+def migrate_csv(source, target):
+    # One-shot copy of the CSV book into another backend; existing rows in the target are replaced
+    for table in TABLES:
+        target.save(table, source.load(table))
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        data_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+        target = BACKENDS[sys.argv[3] if len(sys.argv) > 3 else "sqlite"](data_dir)
+        # A fresh target migrates itself when it is created; this also refreshes an existing one
+        migrate_csv(CSVBackend(data_dir), target)
+        print(f"Migrated CSV files in {data_dir} to the {target.name} backend")
+    else:
+        print("usage: python -m kharch.storage migrate [data_dir] [sqlite|monthly]")
@@ -0,0 +1,74 @@
+"""Concurrent-writer stress run for the storage backends.
+
+    python -m kharch.stress [--backend csv|sqlite|monthly] [--writers 8] [--rows 200] [--edit-every 10]
+
+Every writer process appends rows one at a time the way the Add Expense form does, and
+every --edit-every rows also edits the newest row like a data_editor flush (retrying on
+ConflictError). At the end the book must parse and hold exactly writers * rows new rows.
+tests/test_stress.py runs it at a small size for every backend.
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from datetime import date
+
+import pandas as pd
+
+from kharch.storage import BACKENDS, ConflictError, concat_rows, enforce_schema, get_backend
+
+
+def _writer(backend_name, data_dir, writer, rows, edit_every, conflicts):
+    storage = get_backend(backend_name, data_dir)
+    for n in range(rows):
+        df, version = storage.shared("expenses")
+        new_rows = enforce_schema(pd.DataFrame([{"Date": date.today(), "Item": f"w{writer}-{n}", "Category": "Stress", "Amount": 1.0, "Mode": "Cash"}]))
+        new_rows = new_rows.set_axis([int(df.index.max()) + 1 if len(df) else 0])
+        storage.append("expenses", new_rows, concat_rows(new_rows, df), version)
+        if edit_every and n % edit_every == 0:
+            while True:
+                df, version = storage.shared("expenses")
+                edited = df.copy()
+                edited.loc[edited.index[0], "Item"] += " (edited)"
+                try:
+                    storage.apply_changes("expenses", edited, [edited.index[0]], [], version)
+                    break
+                except ConflictError:
+                    storage.invalidate("expenses")
+                    with conflicts.get_lock():
+                        conflicts.value += 1
+
+
+def run(backend_name="csv", writers=8, rows=200, edit_every=10, data_dir=None):
+    data_dir = data_dir or tempfile.mkdtemp(prefix="kharch-stress-")
+    get_backend(backend_name, data_dir)
+    conflicts = multiprocessing.Value('i', 0)
+    procs = [multiprocessing.Process(target=_writer, args=(backend_name, data_dir, w, rows, edit_every, conflicts)) for w in range(writers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    if any(p.exitcode for p in procs):
+        raise SystemExit("a writer crashed")
+
+    df = get_backend(backend_name, data_dir).load("expenses")
+    expected = writers * rows
+    items = set(df["Item"].str.replace(" (edited)", "", regex=False))
+    missing = [f"w{w}-{n}" for w in range(writers) for n in range(rows) if f"w{w}-{n}" not in items]
+    print(f"{backend_name}: {expected} appends by {writers} writers in {elapsed:.2f}s "
+          f"({expected / elapsed:,.0f} rows/s), {conflicts.value} edit conflicts retried, {len(df)} rows on disk")
+    if len(df) != expected or missing:
+        raise SystemExit(f"lost or duplicated rows: {len(df)} on disk, {len(missing)} missing")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", default="csv", choices=sorted(BACKENDS))
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--edit-every", type=int, default=10, help="0 disables the edit phase")
+    args = parser.parse_args()
+    run(args.backend, args.writers, args.rows, args.edit_every)
@@ -0,0 +1,103 @@
+"""Synthetic Kharch Book datasets for benchmarks.
+
+    python -m kharch.synthetic DATA_DIR --expenses 100000 [--funds N] [--todo 50] [--seed 0]
+
+Categories follow a Zipf-like skew, amounts are log-normal per category, most spends are
+Online, and funds include monthly salary plus ATM withdrawals written as Transfer pairs the
+same way the Wallet page writes them.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from kharch.storage import EXPENSES_FILE, FUNDS_FILE, TODO_FILE, save_csv
+
+CATEGORIES = ["Food", "Travel", "Bills", "Shopping", "Entertainment", "Groceries", "Health", "Fuel",
+              "Rent", "Education", "Gifts", "Other"]
+ITEMS = {
+    "Food": ["Lunch", "Chai", "Swiggy", "Zomato", "Dinner"], "Travel": ["Metro", "Auto", "Uber", "Train"],
+    "Bills": ["Electricity", "Mobile", "Internet", "Water"], "Shopping": ["Amazon", "Clothes", "Shoes"],
+    "Entertainment": ["Movie", "Netflix", "Concert"], "Groceries": ["Vegetables", "Milk", "DMart"],
+    "Health": ["Pharmacy", "Doctor"], "Fuel": ["Petrol"], "Rent": ["Rent"], "Education": ["Books", "Course"],
+    "Gifts": ["Birthday gift"], "Other": ["Misc"],
+}
+MEDIAN_AMOUNT = {"Food": 180, "Travel": 90, "Bills": 900, "Shopping": 1200, "Entertainment": 400,
+                 "Groceries": 600, "Health": 500, "Fuel": 1500, "Rent": 15000, "Education": 2000,
+                 "Gifts": 1500, "Other": 250}
+
+
+def _dates(rng, n, days, end):
+    # Newest first, like the book on disk
+    offsets = np.sort(rng.integers(0, days, n))
+    return pd.Timestamp(end) - pd.to_timedelta(offsets, unit="D")
+
+
+def generate(n_expenses, n_funds=None, n_todo=50, seed=0, days=None, end=None):
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or pd.Timestamp.today().normalize())
+    days = days or max(30, min(20 * 365, n_expenses // 20))
+    n_funds = n_funds if n_funds is not None else max(12, n_expenses // 20)
+
+    weights = 1 / np.arange(1, len(CATEGORIES) + 1) ** 1.2
+    cats = rng.choice(len(CATEGORIES), n_expenses, p=weights / weights.sum())
+    categories = np.array(CATEGORIES)[cats]
+    medians = np.array([MEDIAN_AMOUNT[c] for c in CATEGORIES])[cats]
+    item_idx = rng.integers(0, 5, n_expenses)
+    items = [ITEMS[c][i % len(ITEMS[c])] for c, i in zip(categories, item_idx)]
+    expenses = pd.DataFrame({
+        "Date": _dates(rng, n_expenses, days, end),
+        "Item": items,
+        "Category": categories,
+        "Amount": np.round(medians * rng.lognormal(0, 0.6, n_expenses), 2),
+        "Mode": np.where(rng.random(n_expenses) < 0.7, "Online", "Cash"),
+    })
+
+    # A third of fund rows are Online -> Cash transfer pairs, the rest salary/top-ups
+    n_pairs = n_funds // 3
+    n_plain = n_funds - 2 * n_pairs
+    plain = pd.DataFrame({
+        "Date": _dates(rng, n_plain, days, end),
+        "Source": np.where(rng.random(n_plain) < 0.5, "Salary", "Refund"),
+        "Mode": np.where(rng.random(n_plain) < 0.85, "Online", "Cash"),
+        "Amount": np.round(rng.lognormal(9, 1, n_plain), 2),
+    })
+    pair_dates = _dates(rng, n_pairs, days, end)
+    pair_amounts = np.round(rng.integers(1, 20, n_pairs) * 500.0, 2)
+    pairs = pd.DataFrame({
+        "Date": np.repeat(pair_dates, 2),
+        "Source": np.tile(["Transfer to Cash", "Transfer from Online"], n_pairs),
+        "Mode": np.tile(["Online", "Cash"], n_pairs),
+        "Amount": np.column_stack([-pair_amounts, pair_amounts]).ravel(),
+    })
+    funds = pd.concat([plain, pairs], ignore_index=True).sort_values("Date", ascending=False, kind="stable")
+
+    todo = pd.DataFrame({
+        "Item": [f"Thing {i}" for i in range(n_todo)],
+        "Notes": np.where(rng.random(n_todo) < 0.3, "urgent", ""),
+        "Done": rng.random(n_todo) < 0.2,
+    })
+    return {"expenses": expenses, "funds": funds.reset_index(drop=True), "todo": todo}
+
+
+def write_dataset(data_dir, n_expenses, **kwargs):
+    os.makedirs(data_dir, exist_ok=True)
+    data = generate(n_expenses, **kwargs)
+    for table, name in [("expenses", EXPENSES_FILE), ("funds", FUNDS_FILE), ("todo", TODO_FILE)]:
+        # Row ids count up from the oldest (last) row, as the book numbers them
+        df = data[table]
+        save_csv(df.set_axis(pd.RangeIndex(len(df) - 1, -1, -1)), os.path.join(data_dir, name))
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("data_dir")
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--funds", type=int, default=None)
+    parser.add_argument("--todo", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_dataset(args.data_dir, args.expenses, n_funds=args.funds, n_todo=args.todo, seed=args.seed)
+    print(f"Wrote {args.expenses} expenses to {args.data_dir}")
@@ -0,0 +1,40 @@
+import math
+
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def filter_rows(df, date_range=(), categories=(), modes=()):
+    mask = None
+    def both(m):
+        return m if mask is None else mask & m
+    if len(date_range) == 2:
+        mask = both((df['Date'] >= pd.Timestamp(date_range[0])) & (df['Date'] <= pd.Timestamp(date_range[1])))
+    if categories:
+        mask = both(df['Category'].isin(categories))
+    if modes:
+        mask = both(df['Mode'].isin(modes))
+    return df if mask is None else df[mask]
+
+
+def page_count(n_rows, page_size):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_of(df, page, page_size):
+    # page is 1-based; only this slice is handed to the browser
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def row_label(row_id, row):
+    day = "—" if pd.isna(row['Date']) else f"{row['Date']:%d %b %Y}"
+    amount = "—" if pd.isna(row['Amount']) else f"₹{row['Amount'] / 100:,.2f}"
+    return f"#{row_id} | {day} | {row['Item']} | {amount}"
+
+
+def for_display(df):
+    # Amounts are paise in memory; editors and tables show rupees. Editors report rows by position,
+    # so the row ids are dropped for a plain range index the editor can hide.
+    return df.assign(Amount=df['Amount'].astype('float64') / 100).reset_index(drop=True)
@@ -0,0 +1,10 @@
+import pytest
+
+from kharch import stress
+from kharch.storage import BACKENDS
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_concurrent_writers_keep_every_row(backend, tmp_path):
+    # run() fails when a writer crashes or a row is lost or duplicated
+    stress.run(backend, writers=3, rows=12, edit_every=4, data_dir=str(tmp_path))